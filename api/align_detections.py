@@ -1,78 +1,128 @@
 import json
+import os
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
 import numpy as np
+import orjson
 from scipy.spatial import cKDTree
-from scipy.spatial.distance import cdist
-import matplotlib.pyplot as plt
-from scipy.optimize import linear_sum_assignment
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import min_weight_full_bipartite_matching
+
+# Nearest DOOR candidates considered per EL in the gated Hungarian assignment
+HUNGARIAN_CANDIDATES = 5
+
+@lru_cache(maxsize=16)
+def _load_json_cached(path, mtime):
+    # mtime is part of the cache key so an edited file is re-parsed
+    with open(path, 'rb') as f:
+        return orjson.loads(f.read())
 
 def load_detections(door_file, el_file):
-    with open(door_file, 'r') as f:
-        door_data = json.load(f)
-    with open(el_file, 'r') as f:
-        el_data = json.load(f)
+    # Parsed results are shared between calls; callers must not mutate them
+    door_data = _load_json_cached(door_file, os.path.getmtime(door_file))
+    el_data = _load_json_cached(el_file, os.path.getmtime(el_file))
     return door_data, el_data
 
 def extract_centers(detections):
-    centers = []
-    for det in detections['detections']:
-        bbox = det['bbox']
-        cx = bbox['x'] + bbox['width'] / 2
-        cy = bbox['y'] + bbox['height'] / 2
-        centers.append([cx, cy])
-    return np.array(centers)
-
-def _apply_affine_no_rot(points, sx, sy, tx, ty):
-    pts = np.asarray(points, dtype=np.float64)
-    S = np.array([sx, sy], dtype=np.float64)
-    return pts * S + np.array([tx, ty], dtype=np.float64)
+    bboxes = np.array([
+        [b['x'], b['y'], b['width'], b['height']]
+        for b in (det['bbox'] for det in detections['detections'])
+    ], dtype=np.float32).reshape(-1, 4)
+    return bboxes[:, :2] + 0.5 * bboxes[:, 2:]
+
+# Parsed centers (and the DOOR KD-tree) per detection file, keyed on (path, mtime)
+_TREE_CACHE = {}
+_TREE_CACHE_LOCK = threading.Lock()
+
+def _door_tree(door_centers):
+    return cKDTree(door_centers, balanced_tree=False, compact_nodes=False)
+
+def load_centers_cached(path, with_tree=False):
+    """Centers of a detection file, plus its KD-tree when with_tree is set (else None).
+    Returned arrays are read-only because they are shared between calls."""
+    key = (path, os.path.getmtime(path))
+    with _TREE_CACHE_LOCK:
+        entry = _TREE_CACHE.get(key)
+        if entry is None:
+            # Drop entries for older versions of the same file
+            for stale in [k for k in _TREE_CACHE if k[0] == path]:
+                del _TREE_CACHE[stale]
+            centers = extract_centers(_load_json_cached(*key))
+            centers.flags.writeable = False
+            entry = _TREE_CACHE[key] = [centers, None]
+        if with_tree and entry[1] is None:
+            entry[1] = _door_tree(entry[0])
+        return entry[0], entry[1]
+
+def _apply_affine_no_rot(points, sx, sy, tx, ty, out=None):
+    # Scale and translate in place in one output buffer (reused across ICP iterations via out=).
+    # The parameters take the buffer's dtype so float32 points stay float32 without out=.
+    dtype = points.dtype if out is None else out.dtype
+    out = np.multiply(points, np.array((sx, sy), dtype=dtype), out=out)
+    out += np.array((tx, ty), dtype=dtype)
+    return out
 
 def _least_squares_scale_translation(A, B, anisotropic=False):
-    A = np.asarray(A, dtype=np.float64)
-    B = np.asarray(B, dtype=np.float64)
-    muA = A.mean(axis=0); muB = B.mean(axis=0)
+    # Points may be float32; means (and so the centered sums) accumulate in float64
+    A = np.asarray(A, dtype=np.float32)
+    B = np.asarray(B, dtype=np.float32)
+    muA = A.mean(axis=0, dtype=np.float64); muB = B.mean(axis=0, dtype=np.float64)
     Ac = A - muA; Bc = B - muB
 
     eps = 1e-12
+    # Per-axis cross and auto sums in one pass each over the centered points
+    sxy = np.einsum('ij,ij->j', Ac, Bc)
+    sxx = np.einsum('ij,ij->j', Ac, Ac)
     if anisotropic:
-        denom_x = np.sum(Ac[:, 0]**2) + eps
-        denom_y = np.sum(Ac[:, 1]**2) + eps
-        sx = np.sum(Ac[:, 0] * Bc[:, 0]) / denom_x
-        sy = np.sum(Ac[:, 1] * Bc[:, 1]) / denom_y
-        sx = max(sx, eps); sy = max(sy, eps)
+        sx = max(sxy[0] / (sxx[0] + eps), eps)
+        sy = max(sxy[1] / (sxx[1] + eps), eps)
         tx, ty = (muB - np.array([sx, sy]) * muA)
         return sx, sy, tx, ty
     else:
-        denom = np.sum(Ac * Ac) + eps
-        s = np.sum(Ac * Bc) / denom
-        s = max(s, eps)
+        s = max(sxy.sum() / (sxx.sum() + eps), eps)
         t = muB - s * muA
         return s, s, t[0], t[1]
 
-def cdist_1NN(X, Y):
-    if len(Y) == 0 or len(X) == 0:
-        return np.array([], dtype=np.float64)
-    try:
-        tree = cKDTree(Y)
-        d, _ = tree.query(X, k=1)
-        return d
-    except Exception:
-        return np.min(cdist(X, Y), axis=1)
+def _icp_iter(A, B, treeB, dists_AB, idxB, k_keep, anisotropic, bidir_cost, A_xf):
+    """One trimmed ICP step on float32 point arrays: refit from the current 1-NN pairs and score it.
 
-def align_detections(door_centers, el_centers, anisotropic=False, trim_frac=0.75,
-                     max_iter=10, bidir_cost=True):
-    A = np.asarray(el_centers, dtype=np.float64)    # EL to be aligned
-    B = np.asarray(door_centers, dtype=np.float64)  # DOOR as reference
-    if len(A) == 0 or len(B) == 0:
-        return None, None
+    dists_AB/idxB are the 1-NN query of the current A_xf against treeB. A_xf is a
+    caller-owned (len(A), 2) buffer reused across iterations. The query of the refit
+    transform both scores this step and seeds the next one, so each step runs a single
+    DOOR tree query. Returns (sx, sy, tx, ty, err, dists_AB, idxB).
+    """
+    # k_keep has a floor of 2, so clamp it for 1-point inputs before partitioning
+    k = min(k_keep, len(dists_AB))
+    keep = np.argpartition(dists_AB, k - 1)[:k]
+    sx, sy, tx, ty = _least_squares_scale_translation(A[keep], B[idxB[keep]], anisotropic=anisotropic)
+
+    _apply_affine_no_rot(A, sx, sy, tx, ty, out=A_xf)
+    dists_AB, idxB = treeB.query(A_xf, k=1)
+    dAB = np.partition(dists_AB, k - 1)[:k].mean()
+
+    if bidir_cost:
+        dists_BA, _ = cKDTree(A_xf).query(B, k=1)
+        k_BA = min(k_keep, len(dists_BA))
+        dBA = np.partition(dists_BA, k_BA - 1)[:k_BA].mean()
+        err = 0.5 * (dAB + dBA)
+    else:
+        err = dAB
 
-    muA, muB = A.mean(0), B.mean(0)
+    return sx, sy, tx, ty, err, dists_AB, idxB
+
+def _initial_transform(A, B, anisotropic=False):
+    """Moment-matching (sx, sy, tx, ty) guess from radius-trimmed point clouds"""
+    muA, muB = A.mean(0, dtype=np.float64), B.mean(0, dtype=np.float64)
     Ac, Bc = A - muA, B - muB
     
     def _trim_by_radius(X, keep=0.8):
         if len(X) < 3: return X
-        r = np.linalg.norm(X - X.mean(0), axis=1)
+        Xc = X - X.mean(0)
+        r2 = np.einsum('ij,ij->i', Xc, Xc)  # squared radius ranks the same, no sqrt
         k = max(2, int(keep * len(X)))
-        return X[np.argsort(r)[:k]]
+        return X[np.argpartition(r2, k - 1)[:k]]
     
     Ac0 = _trim_by_radius(Ac, keep=0.8)
     Bc0 = _trim_by_radius(Bc, keep=0.8)
@@ -86,30 +136,30 @@ def align_detections(door_centers, el_centers, anisotropic=False, trim_frac=0.75
         sx0 = sy0 = s0
 
     tx0, ty0 = (muB - np.array([sx0, sy0]) * muA)
-    sx, sy, tx, ty = float(sx0), float(sy0), float(tx0), float(ty0)
+    return float(sx0), float(sy0), float(tx0), float(ty0)
 
-    treeB = cKDTree(B)
+def align_detections(door_centers, el_centers, anisotropic=False, trim_frac=0.75,
+                     max_iter=10, bidir_cost=True, treeB=None, init=None):
+    A = np.asarray(el_centers, dtype=np.float32)    # EL to be aligned
+    B = np.asarray(door_centers, dtype=np.float32)  # DOOR as reference
+    if len(A) == 0 or len(B) == 0:
+        return None, None
+
+    # init: optional (sx, sy, tx, ty) starting transform, e.g. from multi_start_align
+    if init is None:
+        init = _initial_transform(A, B, anisotropic)
+    sx, sy, tx, ty = (float(v) for v in init)
+
+    if treeB is None:
+        treeB = cKDTree(B)
     k_keep = max(2, int(trim_frac * min(len(A), len(B))))
 
+    A_xf = _apply_affine_no_rot(A, sx, sy, tx, ty)
+    dists_AB, idxB = treeB.query(A_xf, k=1)
     prev_err = np.inf
     for _ in range(max_iter):
-        A_xf = _apply_affine_no_rot(A, sx, sy, tx, ty)
-        dists_AB, idxB = treeB.query(A_xf, k=1)
-
-        keep = np.argsort(dists_AB)[:k_keep]
-        A_sel = A[keep]
-        B_sel = B[idxB[keep]]
-
-        sx, sy, tx, ty = _least_squares_scale_translation(A_sel, B_sel, anisotropic=anisotropic)
-
-        A_xf = _apply_affine_no_rot(A, sx, sy, tx, ty)
-        dAB = np.sort(cdist_1NN(A_xf, B))[:k_keep].mean()
-
-        if bidir_cost:
-            dBA = np.sort(cdist_1NN(B, A_xf))[:k_keep].mean()
-            err = 0.5 * (dAB + dBA)
-        else:
-            err = dAB
+        sx, sy, tx, ty, err, dists_AB, idxB = _icp_iter(A, B, treeB, dists_AB, idxB, k_keep,
+                                                        anisotropic, bidir_cost, A_xf)
 
         if abs(prev_err - err) < 1e-6:
             break
@@ -119,7 +169,47 @@ def align_detections(door_centers, el_centers, anisotropic=False, trim_frac=0.75
     params = np.array([scale if scale is not None else sx, 0.0, float(tx), float(ty)], dtype=np.float64)
     return params, float(prev_err)
 
+# Scale multipliers applied to the moment-matching guess for each ICP restart
+RESTART_SCALE_FACTORS = (1.0, 0.8, 1.25, 0.9, 1.1, 0.7, 1.4, 0.6)
+
+def multi_start_align(door_centers, el_centers, restarts=4, anisotropic=False,
+                      trim_frac=0.75, max_iter=10):
+    """Run align_detections from several initial scales in parallel and keep the lowest error"""
+    A = np.asarray(el_centers, dtype=np.float32)
+    B = np.asarray(door_centers, dtype=np.float32)
+    if len(A) == 0 or len(B) == 0:
+        return None, None
+
+    # Rescale the moment-matching guess about the EL centroid so every start stays centered on B
+    sx0, sy0, _, _ = _initial_transform(A, B, anisotropic)
+    muA, muB = A.mean(0, dtype=np.float64), B.mean(0, dtype=np.float64)
+    inits = []
+    for factor in RESTART_SCALE_FACTORS[:max(1, restarts)]:
+        sx, sy = sx0 * factor, sy0 * factor
+        tx, ty = muB - np.array([sx, sy]) * muA
+        inits.append((sx, sy, float(tx), float(ty)))
+
+    kwargs = dict(anisotropic=anisotropic, trim_frac=trim_frac, max_iter=max_iter)
+    try:
+        max_workers = min(len(inits), multiprocessing.cpu_count())
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            futures = [executor.submit(align_detections, B, A, init=init, **kwargs) for init in inits]
+            results = [future.result() for future in futures]
+    except Exception as e:
+        print(f"Parallel ICP restarts failed ({e}), running them sequentially")
+        results = [align_detections(B, A, init=init, **kwargs) for init in inits]
+
+    results = [r for r in results if r[0] is not None]
+    if not results:
+        return None, None
+    return min(results, key=lambda r: r[1])
+
 def visualize_alignment(door_centers, el_centers, aligned_el_centers=None):
+    # Imported here so the tool path never pays matplotlib's startup cost
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    
     plt.figure(figsize=(12, 8))
     
     if len(door_centers) > 0:
@@ -140,8 +230,9 @@ def visualize_alignment(door_centers, el_centers, aligned_el_centers=None):
     plt.savefig('alignment_visualization.png', dpi=150, bbox_inches='tight')
     plt.close()
 
-def assign_many_to_one(aligned_el, door_centers, max_dist=np.inf):
-    tree = cKDTree(door_centers)
+def assign_many_to_one(aligned_el, door_centers, max_dist=np.inf, tree=None):
+    if tree is None:
+        tree = cKDTree(door_centers)
     dists, idx = tree.query(aligned_el, k=1)
     idx[dists > max_dist] = -1
     return idx, dists
@@ -170,9 +261,10 @@ def main():
     for i, center in enumerate(el_centers):
         print(f"  EL_{i+1}: ({center[0]:.1f}, {center[1]:.1f})")
     
-    # Use iterative alignment instead of single-shot
+    # Use iterative alignment instead of single-shot, seeded from parallel ICP restarts
     params, matches, history = iterative_align_and_assign(el_centers, door_centers, 
-                                                         max_iter=10, anisotropic=False, verbose=True)
+                                                         max_iter=10, anisotropic=False, verbose=True,
+                                                         restarts=4)
     
     if params is not None and matches is not None:
         scale, rotation, tx, ty = params
@@ -185,14 +277,11 @@ def main():
         aligned_el_centers = apply_transform_params(el_centers, scale, tx, ty)
         
         # Extract explicit matches from final iteration
-        explicit_matches = []
-        final_cost = 0.0
-        for el_idx, door_idx, dist in matches:
-            if door_idx != -1:  # valid match
-                explicit_matches.append((el_idx, door_idx, dist))
-                final_cost += dist
+        el_idx, door_idx, dist = matches
+        valid = door_idx != -1
+        explicit_matches = list(zip(el_idx[valid], door_idx[valid], dist[valid]))
         
-        avg_cost = final_cost / len(explicit_matches) if explicit_matches else 0.0
+        avg_cost = float(dist[valid].mean()) if explicit_matches else 0.0
         
         print(f"  Final matches: {len(explicit_matches)}")
         print(f"  Final cost: {avg_cost:.2f}")
@@ -238,12 +327,9 @@ def apply_transform_params(points, scale, tx, ty):
 
 def compute_residuals(el_centers, door_centers, matches):
     """Compute residuals for current matches"""
-    residuals = []
-    for el_idx, door_idx, _ in matches:
-        if door_idx != -1:
-            residual = np.linalg.norm(el_centers[el_idx] - door_centers[door_idx])
-            residuals.append(residual)
-    return np.array(residuals)
+    el_idx, door_idx, _ = matches
+    valid = door_idx != -1
+    return np.linalg.norm(el_centers[el_idx[valid]] - door_centers[door_idx[valid]], axis=1)
 
 def adaptive_gating_radius(residuals, factor=3.0):
     """Compute adaptive gating radius from residuals"""
@@ -256,26 +342,33 @@ def adaptive_gating_radius(residuals, factor=3.0):
         # Fallback when MAD=0 (identical residuals)
         return np.percentile(residuals, 90) if residuals.size > 0 else np.inf
 
-def assign_with_gating(aligned_el, door_centers, max_radius=np.inf, method='many_to_one'):
-    """Assign EL to DOOR with gating radius"""
+def assign_with_gating(aligned_el, door_centers, max_radius=np.inf, method='many_to_one', tree=None):
+    """Assign EL to DOOR with gating radius (tree: optional prebuilt cKDTree over door_centers)"""
     if method == 'many_to_one':
-        tree = cKDTree(door_centers)
+        if tree is None:
+            tree = cKDTree(door_centers)
         dists, indices = tree.query(aligned_el, k=1)
-        
-        matches = []
-        for el_idx, (dist, door_idx) in enumerate(zip(dists, indices)):
-            if dist <= max_radius:
-                matches.append((el_idx, door_idx, dist))
-            else:
-                matches.append((el_idx, -1, dist))  # Unmatched
-        return matches
+        indices = np.where(dists <= max_radius, indices, -1)  # -1 = unmatched
+        return np.arange(len(aligned_el)), indices, dists
     
     elif method == 'hungarian':
         n_el, n_door = len(aligned_el), len(door_centers)
-        
-        # Create cost matrix with gating
-        C = cdist(aligned_el, door_centers)
-        C[C > max_radius] = 1e9  # Large penalty for gated distances
+        if n_el == 0:
+            return np.array([], dtype=np.intp), np.array([], dtype=np.intp), np.array([], dtype=np.float64)
+        if tree is None:
+            tree = cKDTree(door_centers)
+        
+        # Candidate edges, without ever forming the dense n_el x n_door distance matrix:
+        # every pair inside a finite gate, or the K nearest DOORs while the gate is open
+        if np.isfinite(max_radius):
+            pairs = cKDTree(aligned_el).sparse_distance_matrix(tree, max_radius, output_type='ndarray')
+            cand_el, cand_door, cand_dist = pairs['i'], pairs['j'], pairs['v']
+        else:
+            k = min(HUNGARIAN_CANDIDATES, n_door)
+            dists, indices = tree.query(aligned_el, k=k)
+            cand_el = np.repeat(np.arange(n_el), k)
+            cand_door = indices.reshape(-1)
+            cand_dist = dists.reshape(-1)
         
         # Set unmatch penalty strictly larger than any allowed real match
         if np.isfinite(max_radius) and max_radius > 0:
@@ -283,54 +376,71 @@ def assign_with_gating(aligned_el, door_centers, max_radius=np.inf, method='many
             lambda_unmatch = 1.5 * max_radius
         else:
             # Fallback for infinite/zero radius cases - use robust scale
-            valid_costs = C[C < 1e8]  # Exclude the gated penalties
-            if len(valid_costs) > 0:
+            if len(cand_dist) > 0:
                 # Use 90th percentile instead of max to avoid outlier domination
-                lambda_unmatch = 1.25 * np.percentile(valid_costs, 90)
+                lambda_unmatch = 1.25 * np.percentile(cand_dist, 90)
             else:
                 lambda_unmatch = 1e6
         
-        # Add dummy columns for unmatched ELs (conservative: allow all to be unmatched)
-        n_dummies = max(1, n_el - n_door, n_el)  # At least n_el dummies
-        dummy_cols = np.full((n_el, n_dummies), lambda_unmatch)
-        C_with_dummies = np.hstack([C, dummy_cols])
+        door_idx = np.full(n_el, -1, dtype=np.intp)
+        match_dist = np.full(n_el, np.inf)
         
-        # No need for row padding with dummy columns
-        C_sq = C_with_dummies
+        # ELs with no DOOR inside the gate are unmatched outright and stay out of the
+        # matching problem, as do DOORs no EL can reach
+        if len(cand_el) == 0:
+            return np.arange(n_el), door_idx, match_dist
         
-        row_ind, col_ind = linear_sum_assignment(C_sq)
+        active, local_rows = np.unique(cand_el, return_inverse=True)
+        doors, local_cols = np.unique(cand_door, return_inverse=True)
+        n_active, n_cols = len(active), len(doors)
         
-        matches = []
-        for r, c in zip(row_ind, col_ind):
-            if r < n_el:  # Valid EL index
-                if c < n_door:  # Matched to real DOOR
-                    matches.append((r, c, C_sq[r, c]))
-                else:  # Matched to dummy (unmatched)
-                    matches.append((r, -1, np.inf))
+        # Each remaining EL gets its own unmatch edge so leaving it unmatched is always feasible.
+        # Weights are offset by 1 because the sparse matcher treats explicit zeros as missing edges.
+        rows = np.concatenate([local_rows, np.arange(n_active)])
+        cols = np.concatenate([local_cols, n_cols + np.arange(n_active)])
+        weights = np.concatenate([cand_dist, np.full(n_active, lambda_unmatch)]) + 1.0
+        graph = csr_matrix((weights, (rows, cols)), shape=(n_active, n_cols + n_active))
         
-        return matches
+        row_ind, col_ind = min_weight_full_bipartite_matching(graph)
+        
+        # Columns past n_cols are unmatch edges; look matched edges' distances up by (row, col) key
+        matched = col_ind < n_cols
+        edge_keys = local_rows * n_cols + local_cols
+        edge_order = np.argsort(edge_keys)
+        matched_keys = row_ind[matched] * n_cols + col_ind[matched]
+        edge_pos = edge_order[np.searchsorted(edge_keys, matched_keys, sorter=edge_order)]
+        
+        el_matched = active[row_ind[matched]]
+        door_idx[el_matched] = doors[col_ind[matched]]
+        match_dist[el_matched] = cand_dist[edge_pos]
+        
+        return np.arange(n_el), door_idx, match_dist
 
 def robust_refit_from_matches(el_centers, door_centers, matches, trim_fraction=0.8, anisotropic=False):
     """Refit transformation parameters from matched pairs with robustness"""
     # Extract valid matched pairs
-    valid_pairs = [(el_idx, door_idx) for el_idx, door_idx, dist in matches if door_idx != -1]
+    el_idx, door_idx, _ = matches
+    valid = door_idx != -1
+    n_valid = int(np.count_nonzero(valid))
     
-    if len(valid_pairs) < 2:
+    if n_valid < 2:
         return None  # Not enough matches
     
-    A = np.array([el_centers[el_idx] for el_idx, _ in valid_pairs])
-    B = np.array([door_centers[door_idx] for _, door_idx in valid_pairs])
+    A = el_centers[el_idx[valid]]
+    B = door_centers[door_idx[valid]]
     
     # Compute residuals for trimming
-    if len(valid_pairs) > 3:  # Only trim if we have enough points
+    if n_valid > 3:  # Only trim if we have enough points
         # Quick fit to get residuals
         sx_temp, sy_temp, tx_temp, ty_temp = _least_squares_scale_translation(A, B, anisotropic)
-        A_transformed = A * np.array([sx_temp, sy_temp]) + np.array([tx_temp, ty_temp])
-        residuals = np.linalg.norm(A_transformed - B, axis=1)
+        A_transformed = _apply_affine_no_rot(A, sx_temp, sy_temp, tx_temp, ty_temp,
+                                             out=np.empty(A.shape, dtype=np.float64))
+        A_transformed -= B
+        residuals = np.einsum('ij,ij->i', A_transformed, A_transformed)  # squared; ranks the same
         
         # Keep best fraction
-        keep_count = max(2, int(trim_fraction * len(valid_pairs)))
-        keep_indices = np.argsort(residuals)[:keep_count]
+        keep_count = max(2, int(trim_fraction * n_valid))
+        keep_indices = np.argpartition(residuals, keep_count - 1)[:keep_count]
         A = A[keep_indices]
         B = B[keep_indices]
     
@@ -355,17 +465,13 @@ def damped_update(old_params, new_params, alpha=0.6):
     
     return np.array([scale, 0.0, tx, ty])
 
-def check_convergence(old_matches, new_matches, old_params, new_params, old_cost=None, new_cost=None,
+def check_convergence(old_assignments, new_assignments, old_params, new_params, old_cost=None, new_cost=None,
                      assignment_tol=0.02, param_tol=1e-4, cost_tol=1e-5):
-    """Check multiple convergence criteria"""
+    """Check multiple convergence criteria (assignments are per-EL DOOR index arrays, -1 = unmatched)"""
     # Assignment stability
-    if old_matches is not None:
-        old_assignments = {el_idx: door_idx for el_idx, door_idx, _ in old_matches}
-        new_assignments = {el_idx: door_idx for el_idx, door_idx, _ in new_matches}
-        
-        changed = sum(1 for el_idx in old_assignments 
-                     if old_assignments.get(el_idx) != new_assignments.get(el_idx))
-        assignment_change_rate = changed / len(new_assignments) if new_assignments else 0
+    if old_assignments is not None:
+        changed = np.count_nonzero(old_assignments != new_assignments)
+        assignment_change_rate = changed / len(new_assignments) if len(new_assignments) else 0
         
         if assignment_change_rate <= assignment_tol:
             return True, "assignment_stable"
@@ -385,17 +491,61 @@ def check_convergence(old_matches, new_matches, old_params, new_params, old_cost
     
     return False, "continuing"
 
+def _history_to_dicts(params, counts, stats):
+    """Convert the preallocated iteration history arrays into JSON-ready dicts"""
+    return [
+        {
+            'iteration': i + 1,
+            'params': p,
+            'num_matches': num_matches,
+            'num_unmatched': num_unmatched,
+            'unmatched_pct': unmatched_pct,
+            'avg_cost': avg_cost,
+            'gating_radius': gating_radius if np.isfinite(gating_radius) else None
+        }
+        for i, (p, (num_matches, num_unmatched), (unmatched_pct, avg_cost, gating_radius))
+        in enumerate(zip(params.tolist(), counts.tolist(), stats.tolist()))
+    ]
+
 def iterative_align_and_assign(el_centers, door_centers, max_iter=10, 
-                              anisotropic=False, verbose=True):
-    """Iterative alignment and assignment with alternating minimization"""
+                              anisotropic=False, verbose=True, coarse_iters=1, restarts=1,
+                              treeB=None, param_tol=1e-4):
+    """Iterative alignment and assignment with alternating minimization
+
+    restarts > 1 seeds the loop with multi_start_align (parallel ICP restarts) instead of
+    a single align_detections run.
+
+    The first coarse_iters iterations, and any iteration whose gating radius is under
+    half the typical DOOR spacing, use plain 1-NN assignment: there the gated
+    neighbourhoods barely overlap and Hungarian would return the same pairs.
+
+    treeB: optional prebuilt cKDTree over door_centers (e.g. from load_centers_cached).
+    param_tol: relative parameter change below which the loop stops right after the update.
+    """
     
     if verbose:
         print(f"\nStarting iterative alignment (max_iter={max_iter})")
     
+    # DOOR centers never change, so build their KD-tree once for every iteration
+    if treeB is None:
+        treeB = _door_tree(door_centers)
+    
+    # Median distance from each DOOR to its nearest other DOOR
+    if len(door_centers) > 1:
+        door_spacing = float(np.median(treeB.query(door_centers, k=2)[0][:, 1]))
+    else:
+        door_spacing = np.inf
+    
     # 1. Initialize with robust alignment
-    initial_params, initial_cost = align_detections(door_centers, el_centers, 
-                                                   anisotropic=anisotropic, 
-                                                   trim_frac=0.75, max_iter=10)
+    if restarts > 1:
+        initial_params, initial_cost = multi_start_align(door_centers, el_centers, restarts=restarts,
+                                                         anisotropic=anisotropic,
+                                                         trim_frac=0.75, max_iter=10)
+    else:
+        initial_params, initial_cost = align_detections(door_centers, el_centers, 
+                                                       anisotropic=anisotropic, 
+                                                       trim_frac=0.75, max_iter=10,
+                                                       treeB=treeB)
     
     if initial_params is None:
         return None, None, []
@@ -404,7 +554,15 @@ def iterative_align_and_assign(el_centers, door_centers, max_iter=10,
     prev_matches = None
     prev_params = None
     prev_cost = None
-    iteration_history = []
+    
+    # Per-iteration history, filled by index and only turned into dicts at the end
+    n_iterations = 0
+    history_params = np.empty((max_iter, 4))
+    history_counts = np.empty((max_iter, 2), dtype=np.intp)  # matched, unmatched
+    history_stats = np.empty((max_iter, 3))  # unmatched_pct, avg_cost, gating_radius
+    
+    # Transformed EL centers are rewritten in place each iteration rather than reallocated
+    aligned_el = np.empty(el_centers.shape, dtype=np.float64)
     
     for iteration in range(max_iter):
         if verbose:
@@ -412,7 +570,7 @@ def iterative_align_and_assign(el_centers, door_centers, max_iter=10,
         
         # 2. Apply current transform
         scale, _, tx, ty = params
-        aligned_el = apply_transform_params(el_centers, scale, tx, ty)
+        aligned_el = _apply_affine_no_rot(el_centers, scale, scale, tx, ty, out=aligned_el)
         
         # 3. Compute adaptive gating radius
         if prev_matches is not None:
@@ -421,46 +579,56 @@ def iterative_align_and_assign(el_centers, door_centers, max_iter=10,
         else:
             gating_radius = np.inf  # No gating on first iteration
         
-        # 4. Assign with gating
+        # 4. Assign with gating (global Hungarian only when gated neighbourhoods can compete)
+        if iteration < coarse_iters or gating_radius < door_spacing / 2:
+            method = 'many_to_one'
+        else:
+            method = 'hungarian'
         new_matches = assign_with_gating(aligned_el, door_centers, 
-                                       max_radius=gating_radius, method='hungarian')
+                                       max_radius=gating_radius, method=method,
+                                       tree=treeB)
         
         # 5. Refit parameters from matches (with safety check)
-        valid_matches = [m for m in new_matches if m[1] != -1]
-        if len(valid_matches) >= 2:
+        _, new_door_idx, new_dist = new_matches
+        valid_mask = new_door_idx != -1
+        num_valid = int(np.count_nonzero(valid_mask))
+        if num_valid >= 2:
             new_params_raw = robust_refit_from_matches(el_centers, door_centers, new_matches,
                                                       trim_fraction=0.8, anisotropic=anisotropic)
             # 6. Apply damped update
             new_params = damped_update(params, new_params_raw, alpha=0.6)
+            param_change = np.linalg.norm(new_params - params) / (np.linalg.norm(params) + 1e-12)
         else:
             if verbose:
-                print(f"    Warning: Only {len(valid_matches)} valid matches, keeping current params")
+                print(f"    Warning: Only {num_valid} valid matches, keeping current params")
             new_params = params.copy()  # Keep current params if too few matches
+            param_change = np.inf  # Not a fixed point, just a failed refit
         
         # 7. Compute cost and health metrics
-        avg_cost = np.mean([dist for _, _, dist in valid_matches]) if valid_matches else np.inf
-        unmatched_count = len([m for m in new_matches if m[1] == -1])
-        unmatched_pct = (unmatched_count / len(new_matches)) * 100 if new_matches else 0
+        avg_cost = new_dist[valid_mask].mean() if num_valid else np.inf
+        unmatched_count = len(new_door_idx) - num_valid
+        unmatched_pct = (unmatched_count / len(new_door_idx)) * 100 if len(new_door_idx) else 0
         
         # 8. Store iteration info
-        iteration_info = {
-            'iteration': iteration + 1,
-            'params': new_params.tolist(),
-            'num_matches': len(valid_matches),
-            'num_unmatched': unmatched_count,
-            'unmatched_pct': float(unmatched_pct),
-            'avg_cost': float(avg_cost),
-            'gating_radius': float(gating_radius) if np.isfinite(gating_radius) else None
-        }
-        iteration_history.append(iteration_info)
+        history_params[iteration] = new_params
+        history_counts[iteration] = (num_valid, unmatched_count)
+        history_stats[iteration] = (unmatched_pct, avg_cost, gating_radius)
+        n_iterations = iteration + 1
         
         if verbose:
-            print(f"    Matches: {len(valid_matches)}, Cost: {avg_cost:.2f}, Unmatched: {unmatched_pct:.1f}%, Radius: {gating_radius:.1f}")
+            print(f"    Matches: {num_valid}, Cost: {avg_cost:.2f}, Unmatched: {unmatched_pct:.1f}%, Radius: {gating_radius:.1f}")
         
-        # 9. Check convergence BEFORE updating (use prev vs new)
-        converged, reason = check_convergence(prev_matches, new_matches, prev_params, new_params, 
-                                            prev_cost, avg_cost)
-        if converged and iteration > 0:  # Don't converge on first iteration
+        # 9. Check convergence BEFORE updating (use prev vs new). If the update barely moved
+        # the params, the next assignment would reproduce these matches: stop now, even on
+        # the first iteration, instead of paying for one more assignment and refit.
+        if param_change < param_tol:
+            converged, reason = True, "param_update_stable"
+        else:
+            converged, reason = check_convergence(prev_matches[1] if prev_matches is not None else None,
+                                                new_door_idx, prev_params, new_params,
+                                                prev_cost, avg_cost, param_tol=param_tol)
+            converged = converged and iteration > 0  # Don't converge on first iteration
+        if converged:
             if verbose:
                 print(f"    Converged: {reason}")
             # Update final values before breaking
@@ -475,6 +643,10 @@ def iterative_align_and_assign(el_centers, door_centers, max_iter=10,
         prev_cost = avg_cost
         params = new_params
     
+    iteration_history = _history_to_dicts(history_params[:n_iterations],
+                                          history_counts[:n_iterations],
+                                          history_stats[:n_iterations])
+    
     return (prev_params if prev_params is not None else params,
             prev_matches if prev_matches is not None else new_matches if 'new_matches' in locals() else None, 
             iteration_history)
@@ -519,10 +691,8 @@ def align_detections_tool(project_id: int, sheet_code: str = None):
         sheet = sheets[0]
         
         # EXACT align_detections.py logic
-        door_data, el_data = load_detections('door_detections.json', 'el_detections.json')
-        
-        door_centers = extract_centers(door_data)
-        el_centers = extract_centers(el_data)
+        door_centers, door_tree = load_centers_cached('door_detections.json', with_tree=True)
+        el_centers, _ = load_centers_cached('el_detections.json')
 
         print(f"Found {len(door_centers)} DOOR centers and {len(el_centers)} EL centers")
         
@@ -547,7 +717,8 @@ def align_detections_tool(project_id: int, sheet_code: str = None):
         
         # Use iterative alignment instead of single-shot
         params, matches, history = iterative_align_and_assign(el_centers, door_centers, 
-                                                             max_iter=10, anisotropic=False, verbose=True)
+                                                             max_iter=10, anisotropic=False, verbose=True,
+                                                             treeB=door_tree)
         
         if params is not None and matches is not None:
             scale, rotation, tx, ty = params
@@ -560,14 +731,11 @@ def align_detections_tool(project_id: int, sheet_code: str = None):
             aligned_el_centers = apply_transform_params(el_centers, scale, tx, ty)
             
             # Extract explicit matches from final iteration
-            explicit_matches = []
-            final_cost = 0.0
-            for el_idx, door_idx, dist in matches:
-                if door_idx != -1:  # valid match
-                    explicit_matches.append((el_idx, door_idx, dist))
-                    final_cost += dist
+            el_idx, door_idx, dist = matches
+            valid = door_idx != -1
+            explicit_matches = list(zip(el_idx[valid], door_idx[valid], dist[valid]))
             
-            avg_cost = final_cost / len(explicit_matches) if explicit_matches else 0.0
+            avg_cost = float(dist[valid].mean()) if explicit_matches else 0.0
             
             print(f"  Final matches: {len(explicit_matches)}")
             print(f"  Final cost: {avg_cost:.2f}")
@@ -2,12 +2,47 @@
 Column extraction utility for construction drawings
 """
 import fitz
+import numpy as np
 import os
+import sys
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
 from typing import List, Dict, Tuple
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 from database import SheetColumn, Sheet, Document, Project, SessionLocal
+from multiprocessing_workers import extract_sheet_columns_worker
+from pdf_cache import open_pdf, PDF_LOCK
 
+# Column filter thresholds
+SLAB_FILL_COLOR = 0.753
+# Plan-type specific fill colors for column identification on floor/structural plans
+PLAN_FILL_COLORS = {
+    "structural": 1.0,      # White fill
+    "architectural": 0.498,  # Medium gray fill
+}
+DEFAULT_FILL_COLOR = 0.8
+FILL_SCALE = 1000  # Fills are compared as integer thousandths (8-bit color levels are ~4 apart)
+MIN_COLUMN_SIZE = 10.0
+MAX_COLUMN_SIZE = 20.0
+EXCLUDED_SIZE = 18.72  # Symbol size on floor/structural plans, not a column
+EXCLUDED_SIZE_TOLERANCE = 0.001
+MAX_STRUCTURAL_SEQNO = 1000
+_NO_FILL = (0, 0, 0)
+_SIZE_MID = (MIN_COLUMN_SIZE + MAX_COLUMN_SIZE) / 2
+_SIZE_HALF_RANGE = (MAX_COLUMN_SIZE - MIN_COLUMN_SIZE) / 2
 
+# Title keywords for plan type detection
+STRUCTURAL_KEYWORDS = ('STRUCTURAL', 'FOUNDATION', 'FRAMING', 'BEAM', 'COLUMN SCHEDULE')
+ARCHITECTURAL_KEYWORDS = ('ARCHITECTURAL', 'FLOOR PLAN', 'PLAN VIEW', 'FURNITURE')
+SLAB_KEYWORDS = ('SLAB',)
+
+# Per-column debug output (one line per column); off so server runs don't pay for it
+PRINT_COLUMN_DETAILS = False
+
+
+@lru_cache(maxsize=512)
 def detect_plan_type(sheet_title: str, sheet_type: str = None) -> str:
     """
     Detect the plan type based on sheet title and sheet type
@@ -19,34 +54,30 @@ def detect_plan_type(sheet_title: str, sheet_type: str = None) -> str:
     Returns:
         str: Plan type ('structural', 'architectural', 'slab', or 'unknown')
     """
+    # Convert title to uppercase once for keyword matching
+    title = sheet_title.upper() if sheet_title else ""
+    
     # First check sheet type if available
     if sheet_type:
         sheet_type_upper = sheet_type.upper()
-        sheet_title_upper = sheet_title.upper() if sheet_title else ""
         
         # Direct mapping from sheet type
-        if 'S' in sheet_type_upper and 'FLOOR PLAN' in sheet_title_upper:
-            return "structural"
-        elif 'A' in sheet_type_upper and 'FLOOR PLAN' in sheet_title_upper:
-            return "architectural"
-        elif 'SLAB' in sheet_type_upper:
+        if 'FLOOR PLAN' in title:
+            if 'S' in sheet_type_upper:
+                return "structural"
+            if 'A' in sheet_type_upper:
+                return "architectural"
+        if 'SLAB' in sheet_type_upper:
             return "slab"
     
     # Fallback to title-based detection
-    if not sheet_title:
+    if not title:
         return "unknown"
-        
-    # Convert title to uppercase for keyword matching
-    title = sheet_title.upper()
     
     # Look for plan type indicators in the title
-    structural_keywords = ['STRUCTURAL', 'FOUNDATION', 'FRAMING', 'BEAM', 'COLUMN SCHEDULE']
-    architectural_keywords = ['ARCHITECTURAL', 'FLOOR PLAN', 'PLAN VIEW', 'FURNITURE']
-    slab_keywords = ['SLAB']
-    
-    structural_score = sum(1 for keyword in structural_keywords if keyword in title)
-    architectural_score = sum(1 for keyword in architectural_keywords if keyword in title)
-    slab_score = sum(1 for keyword in slab_keywords if keyword in title)
+    slab_score = sum(keyword in title for keyword in SLAB_KEYWORDS)
+    architectural_score = sum(keyword in title for keyword in ARCHITECTURAL_KEYWORDS)
+    structural_score = sum(keyword in title for keyword in STRUCTURAL_KEYWORDS)
     
     # Determine plan type based on keyword matches
     if structural_score > architectural_score and structural_score > slab_score:
@@ -59,156 +90,132 @@ def detect_plan_type(sheet_title: str, sheet_type: str = None) -> str:
         return "unknown"
 
 
-def extract_column_centers_slab(pdf_path: str, page_number: int) -> List[Dict]:
+def _page_filled_drawings(pdf_path: str, page_number: int, doc: fitz.Document = None):
     """
-    Extract column centers from slab plans (original method)
+    Total drawing count and the filled ('f') drawings of a 1-based page,
+    or None if the page does not exist
+    
+    Args:
+        pdf_path: Path to the PDF file (opened through the document cache if doc is None)
+        page_number: Page number (1-based)
+        doc: Optional already-open document for pdf_path
     """
-    doc = fitz.open(pdf_path)
+    if doc is None:
+        doc = open_pdf(pdf_path)
     
-    if page_number > len(doc):
-        print(f"Error: Page {page_number} does not exist. PDF has {len(doc)} pages.")
-        doc.close()
-        return []
+    with PDF_LOCK:
+        if page_number > len(doc):
+            print(f"Error: Page {page_number} does not exist. PDF has {len(doc)} pages.")
+            return None
+        # Raw drawing dicts: same keys as get_drawings() without building Rect/path objects
+        drawings = doc[page_number - 1].get_cdrawings()
     
-    page = doc[page_number - 1]
-    drawings = page.get_drawings()
+    # Columns are filled shapes; partition once so the filters never see stroke drawings
+    return len(drawings), [d for d in drawings if d.get('type') == 'f']
+
+
+def _column_candidates(filled, fill_color: float, max_seqno: int = None,
+                       exclude_symbols: bool = False) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Rect bounds (N x 4: x0, y0, x1, y1) and sizes (N x 2: width, height) of filled drawings
+    in the given fill color whose sides are both within the column size window
+    (and, with exclude_symbols, neither side is the 18.72-unit symbol size)
+    """
+    # Fill (and seqno) tests run as integer NumPy compares over all filled drawings;
+    # rect tuples (plain (x0, y0, x1, y1)) are only gathered for the survivors
+    fills = np.fromiter(((d.get('fill') or _NO_FILL)[0] for d in filled), dtype=np.float64, count=len(filled))
+    keep = np.rint(fills * FILL_SCALE).astype(np.int32) == round(fill_color * FILL_SCALE)
+    if max_seqno is not None:
+        seqnos = np.fromiter((d.get('seqno', -1) for d in filled), dtype=np.int64, count=len(filled))
+        keep &= seqnos <= max_seqno
+    
+    rects = [rect for rect in (filled[i]['rect'] for i in np.flatnonzero(keep).tolist()) if rect is not None]
+    rects = np.array(rects, dtype=np.float64).reshape(-1, 4)
+    
+    # Width and height side by side, tested together: min <= size <= max is one compare
+    # of |size - mid| (exact, as size - mid is exact for sizes near the window)
+    sizes = np.abs(rects[:, 2:] - rects[:, :2])
+    mask = (np.abs(sizes - _SIZE_MID) <= _SIZE_HALF_RANGE).all(axis=1)
+    if exclude_symbols:
+        mask &= (np.abs(sizes - EXCLUDED_SIZE) >= EXCLUDED_SIZE_TOLERANCE).all(axis=1)
+    return rects[mask], sizes[mask]
+
+
+def _columns_from_rects(rects: np.ndarray, sizes: np.ndarray, plan_type: str, first_index: int) -> List[Dict]:
+    """Build column dicts (center, size) from rect bounds and sizes"""
+    centers = (rects[:, :2] + rects[:, 2:]) / 2
+    return [
+        {
+            "index": index,
+            "center": (center_x, center_y),
+            "center_x": center_x,
+            "center_y": center_y,
+            "width": width,
+            "height": height,
+            "plan_type": plan_type
+        }
+        for index, ((center_x, center_y), (width, height))
+        in enumerate(zip(centers.tolist(), sizes.tolist()), start=first_index)
+    ]
+
+
+def extract_column_centers_slab(pdf_path: str, page_number: int, doc: fitz.Document = None) -> List[Dict]:
+    """
+    Extract column centers from slab plans (original method)
+    """
+    page_drawings = _page_filled_drawings(pdf_path, page_number, doc)
+    if page_drawings is None:
+        return []
+    total_drawings, filled = page_drawings
     
     print(f"Processing slab plan on page {page_number}")
-    print(f"Found {len(drawings)} total drawings on page")
+    print(f"Found {total_drawings} total drawings on page")
     
-    columns = []
-    column_count = 0
+    # Columns are filled shapes in the slab fill color, 10-20 units on each side
+    rects, sizes = _column_candidates(filled, SLAB_FILL_COLOR)
+    columns = _columns_from_rects(rects, sizes, "slab", first_index=0)
     
-    # Process each drawing to find columns
-    for i, drawing in enumerate(drawings):
-        drawing_type = drawing.get('type', 'Unknown')
-        
-        # Check if drawing type is 'f' (filled) - columns are filled shapes
-        if drawing_type == 'f':
-            rect = drawing.get('rect')
-            fill_color = drawing.get('fill', [0, 0, 0])
-            
-            # Filter by fill color (0.753 for slab plans)
-            if abs(fill_color[0] - 0.753) > 0.001:
-                continue
-            
-            if rect:
-                width = abs(rect.x1 - rect.x0)
-                height = abs(rect.y1 - rect.y0)
-                
-                # Filter by size constraints (10-20 units for slab plans)
-                if width < 10 or height < 10 or width > 20 or height > 20:
-                    continue
-                
-                # Calculate center point
-                center_x = (rect.x0 + rect.x1) / 2
-                center_y = (rect.y0 + rect.y1) / 2
-                
-                column_data = {
-                    "index": column_count,
-                    "center": (center_x, center_y),
-                    "center_x": center_x,
-                    "center_y": center_y,
-                    "width": width,
-                    "height": height,
-                    "plan_type": "slab"
-                }
-                
-                columns.append(column_data)
-                column_count += 1
-                
-                print(f"Column {column_count}: Center ({center_x:.1f}, {center_y:.1f}), "
-                      f"Bounds: ({rect.x0:.1f}, {rect.y0:.1f}, {rect.x1:.1f}, {rect.y1:.1f})")
+    if PRINT_COLUMN_DETAILS:
+        for column_count, (column, rect) in enumerate(zip(columns, rects.tolist()), start=1):
+            print(f"Column {column_count}: Center ({column['center_x']:.1f}, {column['center_y']:.1f}), "
+                  f"Bounds: ({rect[0]:.1f}, {rect[1]:.1f}, {rect[2]:.1f}, {rect[3]:.1f})")
     
-    doc.close()
     print(f"Found {len(columns)} columns in slab plan")
     return columns
 
 
-def extract_column_centers_floor_structural(pdf_path: str, page_number: int, plan_type: str) -> List[Dict]:
+def extract_column_centers_floor_structural(pdf_path: str, page_number: int, plan_type: str,
+                                            doc: fitz.Document = None) -> List[Dict]:
     """
     Extract column centers from floor plans and structural plans using fill color detection
     """
-    doc = fitz.open(pdf_path)
-    
-    if page_number > len(doc):
-        print(f"Error: Page {page_number} does not exist. PDF has {len(doc)} pages.")
-        doc.close()
+    page_drawings = _page_filled_drawings(pdf_path, page_number, doc)
+    if page_drawings is None:
         return []
-    
-    page = doc[page_number - 1]
-    drawings = page.get_drawings()
+    total_drawings, filled = page_drawings
     
     print(f"Processing {plan_type} plan on page {page_number}")
-    print(f"Found {len(drawings)} total drawings on page")
-    
-    # Plan-type specific fill colors for column identification
-    target_fill_colors = {
-        "structural": 1.0,      # White fill
-        "architectural": 0.498,  # Medium gray fill
-    }
+    print(f"Found {total_drawings} total drawings on page")
     
-    target_fill_color = target_fill_colors.get(plan_type)
+    target_fill_color = PLAN_FILL_COLORS.get(plan_type)
     if target_fill_color is None:
         print(f"Warning: Unknown plan type '{plan_type}', using default detection")
-        target_fill_color = 0.8
+        target_fill_color = DEFAULT_FILL_COLOR
     
     print(f"Looking for fill color: {target_fill_color}")
     
-    columns = []
-    column_id = 1
-    
-    # Process each drawing to find columns
-    for i, drawing in enumerate(drawings):
-        drawing_type = drawing.get('type', 'Unknown')
-        
-        # Check if drawing type is 'f' (filled) - columns are filled shapes
-        if drawing_type == 'f':
-            rect = drawing.get('rect')
-            fill_color = drawing.get('fill', [0, 0, 0])
-            seq_no = drawing.get('seqno', -1)
-
-            if plan_type == "structural" and seq_no > 1000:
-                continue
-            
-            # Filter by fill color based on plan type
-            if abs(fill_color[0] - target_fill_color) > 0.001:
-                continue
-            
-            if rect:
-                width = abs(rect.x1 - rect.x0)
-                height = abs(rect.y1 - rect.y0)
-                
-                # Filter by size constraints (10-20 units as per original logic)
-                if width < 10 or height < 10 or width > 20 or height > 20:
-                    continue
-
-                if abs(width - 18.72) < 0.001 or abs(height - 18.72) < 0.001:
-                    continue
-                
-                # Calculate center point
-                center_x = (rect.x0 + rect.x1) / 2
-                center_y = (rect.y0 + rect.y1) / 2
-                
-                column_data = {
-                    "index": column_id,
-                    "center": (center_x, center_y),
-                    "center_x": center_x,
-                    "center_y": center_y,
-                    "width": width,
-                    "height": height,
-                    "plan_type": plan_type
-                }
-                
-                columns.append(column_data)
-                column_id += 1
+    # Columns are filled shapes in the plan's fill color, 10-20 units on each side and not
+    # the 18.72-unit symbol squares; structural plans only count early drawings (seqno <= 1000)
+    max_seqno = MAX_STRUCTURAL_SEQNO if plan_type == "structural" else None
+    rects, sizes = _column_candidates(filled, target_fill_color, max_seqno, exclude_symbols=True)
+    columns = _columns_from_rects(rects, sizes, plan_type, first_index=1)
     
-    doc.close()
     print(f"Found {len(columns)} columns in {plan_type} plan")
     return columns
 
 
-def extract_column_centers(pdf_path: str, page_number: int, sheet_title: str = None, sheet_type: str = None) -> List[Dict]:
+def extract_column_centers(pdf_path: str, page_number: int, sheet_title: str = None, sheet_type: str = None,
+                           doc: fitz.Document = None) -> List[Dict]:
     """
     Extract column centers from PDF page using appropriate method based on plan type
     
@@ -217,6 +224,7 @@ def extract_column_centers(pdf_path: str, page_number: int, sheet_title: str = N
         page_number: Page number (1-based)
         sheet_title: Title of the sheet for plan type detection
         sheet_type: Type of the sheet for plan type detection
+        doc: Optional already-open document for pdf_path (otherwise the cached one is used)
         
     Returns:
         list: List of column center positions with metadata
@@ -227,42 +235,48 @@ def extract_column_centers(pdf_path: str, page_number: int, sheet_title: str = N
     
     # Use appropriate extraction method based on plan type
     if plan_type == "slab":
-        return extract_column_centers_slab(pdf_path, page_number)
+        return extract_column_centers_slab(pdf_path, page_number, doc)
     elif plan_type in ["structural", "architectural"]:
-        return extract_column_centers_floor_structural(pdf_path, page_number, plan_type)
+        return extract_column_centers_floor_structural(pdf_path, page_number, plan_type, doc)
     else:
         # Default to slab method for unknown types
         print("Using default slab extraction method for unknown plan type")
-        return extract_column_centers_slab(pdf_path, page_number)
+        return extract_column_centers_slab(pdf_path, page_number, doc)
 
 
-def save_columns_to_database(sheet_id: int, columns: List[Dict]) -> bool:
+def save_columns_to_database(sheet_id: int, columns: List[Dict], db: Session = None) -> bool:
     """
     Save extracted columns to the database
     
     Args:
         sheet_id: ID of the sheet
         columns: List of column data dictionaries
+        db: Optional session to use (a new one is opened and closed otherwise)
         
     Returns:
         bool: True if successful, False otherwise
     """
-    db = SessionLocal()
+    close_db = False
+    if db is None:
+        db = SessionLocal()
+        close_db = True
+    
     try:
         # Clear existing columns for this sheet
         db.query(SheetColumn).filter(SheetColumn.sheet_id == sheet_id).delete()
         
-        # Add new columns
-        for column_data in columns:
-            db_column = SheetColumn(
-                sheet_id=sheet_id,
-                column_index=column_data["index"],
-                center_x=column_data["center_x"],
-                center_y=column_data["center_y"],
-                width=column_data["width"],
-                height=column_data["height"]
-            )
-            db.add(db_column)
+        # Add new columns in one executemany rather than one ORM object per column
+        db.bulk_insert_mappings(SheetColumn, [
+            {
+                "sheet_id": sheet_id,
+                "column_index": column_data["index"],
+                "center_x": column_data["center_x"],
+                "center_y": column_data["center_y"],
+                "width": column_data["width"],
+                "height": column_data["height"]
+            }
+            for column_data in columns
+        ])
         
         db.commit()
         print(f"✅ Successfully saved {len(columns)} columns to database for sheet {sheet_id}")
@@ -273,57 +287,146 @@ def save_columns_to_database(sheet_id: int, columns: List[Dict]) -> bool:
         print(f"❌ Error saving columns to database: {e}")
         return False
     finally:
-        db.close()
+        if close_db:
+            db.close()
 
 
-def extract_and_save_sheet_columns(sheet_id: int) -> Dict[str, any]:
+def extract_and_save_sheet_columns(sheet_id: int, db: Session = None) -> Dict[str, any]:
     """
     Extract columns from a sheet and save to database
     
     Args:
         sheet_id: ID of the sheet to process
+        db: Optional session to use for the lookup and the save (a new one is opened otherwise)
         
     Returns:
         dict: Result with success status and data
     """
-    db = SessionLocal()
+    close_db = False
+    if db is None:
+        db = SessionLocal()
+        close_db = True
+    
     try:
-        # Get sheet information
-        sheet = db.query(Sheet).filter(Sheet.id == sheet_id).first()
+        # Get sheet information and its document path in one query
+        sheet = (
+            db.query(Sheet.code, Sheet.page, Sheet.title, Sheet.type, Document.path)
+            .outerjoin(Document, Sheet.document_id == Document.id)
+            .filter(Sheet.id == sheet_id)
+            .first()
+        )
         if not sheet:
             return {"success": False, "error": f"Sheet {sheet_id} not found"}
         
-        # Get document path
-        document = db.query(Document).filter(Document.id == sheet.document_id).first()
-        if not document or not document.path:
+        sheet_code, page, title, sheet_type, pdf_path = sheet
+        if not pdf_path:
             return {"success": False, "error": f"Document path not found for sheet {sheet_id}"}
         
-        pdf_path = document.path
         if not os.path.exists(pdf_path):
             return {"success": False, "error": f"PDF file not found: {pdf_path}"}
         
         # Extract columns using sheet title and type for plan type detection
-        print(f"🔍 Extracting columns from {pdf_path}, page {sheet.page}")
-        columns = extract_column_centers(pdf_path, sheet.page, sheet.title, sheet.type)
+        print(f"🔍 Extracting columns from {pdf_path}, page {page}")
+        columns = extract_column_centers(pdf_path, page, title, sheet_type)
         
         if not columns:
-            return {"success": True, "message": f"No columns found in sheet {sheet.code}", "columns": []}
+            return {"success": True, "message": f"No columns found in sheet {sheet_code}", "columns": []}
         
-        # Save to database
-        success = save_columns_to_database(sheet_id, columns)
+        # Save to database in the same session
+        success = save_columns_to_database(sheet_id, columns, db)
         if not success:
             return {"success": False, "error": "Failed to save columns to database"}
         
         return {
             "success": True,
-            "message": f"Successfully extracted and saved {len(columns)} columns from sheet {sheet.code}",
+            "message": f"Successfully extracted and saved {len(columns)} columns from sheet {sheet_code}",
             "columns": columns,
-            "sheet_code": sheet.code
+            "sheet_code": sheet_code
         }
         
     except Exception as e:
         print(f"❌ Error in extract_and_save_sheet_columns: {e}")
         return {"success": False, "error": str(e)}
+    finally:
+        if close_db:
+            db.close()
+
+
+def extract_and_save_project_columns(project_id: int) -> Dict[int, Dict[str, any]]:
+    """
+    Extract columns for every sheet of a project in parallel and save them, keyed by sheet id
+    
+    Workers only parse the PDFs; this process does all database writes with one session.
+    
+    Args:
+        project_id: ID of the project
+        
+    Returns:
+        dict: Per-sheet results with success status and data
+    """
+    db = SessionLocal()
+    try:
+        # Grouped by document so each worker's cached document is reused across its sheets
+        sheets = (
+            db.query(Sheet.id, Sheet.code, Sheet.page, Sheet.title, Sheet.type, Document.path)
+            .join(Document, Sheet.document_id == Document.id)
+            .filter(Document.project_id == project_id)
+            .order_by(Document.path, Sheet.page)
+            .all()
+        )
+        
+        results = {}
+        jobs = []
+        for sheet_id, code, page, title, sheet_type, pdf_path in sheets:
+            if not pdf_path or not os.path.exists(pdf_path):
+                results[sheet_id] = {"success": False, "error": f"PDF file not found: {pdf_path}"}
+            else:
+                jobs.append((pdf_path, page, title, sheet_type, sheet_id))
+        codes = {sheet_id: code for sheet_id, code, *_ in sheets}
+        
+        extracted = {}
+        if jobs:
+            max_workers = min(len(jobs), multiprocessing.cpu_count(), 4)
+            print(f"🔍 Extracting columns for {len(jobs)} sheets with {max_workers} workers")
+            try:
+                with ProcessPoolExecutor(max_workers=max_workers) as executor:
+                    future_to_sheet = {
+                        executor.submit(extract_sheet_columns_worker, *job): job[-1]
+                        for job in jobs
+                    }
+                    
+                    for future in future_to_sheet:
+                        sheet_id = future_to_sheet[future]
+                        try:
+                            _, extracted[sheet_id] = future.result(timeout=300)  # 5 minute timeout per sheet
+                        except Exception as e:
+                            print(f"❌ Exception extracting columns for sheet {sheet_id}: {e}")
+                            results[sheet_id] = {"success": False, "error": str(e)}
+            
+            except Exception as e:
+                print(f"❌ Multiprocessing column extraction failed: {e}")
+                print("🔄 Falling back to sequential extraction...")
+                for pdf_path, page, title, sheet_type, sheet_id in jobs:
+                    if sheet_id not in extracted and sheet_id not in results:
+                        extracted[sheet_id] = extract_column_centers(pdf_path, page, title, sheet_type)
+        
+        for sheet_id, columns in extracted.items():
+            # Like the single-sheet path, an empty result leaves existing columns alone
+            if not columns:
+                results[sheet_id] = {"success": True, "message": f"No columns found in sheet {codes[sheet_id]}", "columns": []}
+                continue
+            if not save_columns_to_database(sheet_id, columns, db):
+                results[sheet_id] = {"success": False, "error": "Failed to save columns to database"}
+                continue
+            results[sheet_id] = {
+                "success": True,
+                "message": f"Successfully extracted and saved {len(columns)} columns from sheet {codes[sheet_id]}",
+                "columns": columns,
+                "sheet_code": codes[sheet_id]
+            }
+        
+        return results
+    
     finally:
         db.close()
 
@@ -340,19 +443,26 @@ def get_sheet_columns(sheet_id: int) -> Dict[str, any]:
     """
     db = SessionLocal()
     try:
-        columns = db.query(SheetColumn).filter(SheetColumn.sheet_id == sheet_id).order_by(SheetColumn.column_index).all()
+        # Plain row tuples: the result is read-only, so skip building ORM instances
+        rows = db.execute(
+            select(SheetColumn.id, SheetColumn.column_index, SheetColumn.center_x, SheetColumn.center_y,
+                   SheetColumn.width, SheetColumn.height, SheetColumn.created_at)
+            .where(SheetColumn.sheet_id == sheet_id)
+            .order_by(SheetColumn.column_index)
+        ).all()
         
-        column_data = []
-        for column in columns:
-            column_data.append({
-                "id": column.id,
-                "index": column.column_index,
-                "center_x": column.center_x,
-                "center_y": column.center_y,
-                "width": column.width,
-                "height": column.height,
-                "created_at": column.created_at.isoformat()
-            })
+        column_data = [
+            {
+                "id": column_id,
+                "index": column_index,
+                "center_x": center_x,
+                "center_y": center_y,
+                "width": width,
+                "height": height,
+                "created_at": created_at.isoformat()
+            }
+            for column_id, column_index, center_x, center_y, width, height, created_at in rows
+        ]
         
         return {
             "success": True,
@@ -364,4 +474,15 @@ def get_sheet_columns(sheet_id: int) -> Dict[str, any]:
         print(f"❌ Error getting sheet columns: {e}")
         return {"success": False, "error": str(e)}
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+
+if __name__ == "__main__":
+    # Batch column extraction for one project: python columns.py <project_id>
+    if len(sys.argv) != 2:
+        print('Usage: python columns.py <project_id>')
+        sys.exit(1)
+    
+    results = extract_and_save_project_columns(int(sys.argv[1]))
+    succeeded = sum(1 for result in results.values() if result["success"])
+    print(f"✅ Extracted columns for {succeeded}/{len(results)} sheets")
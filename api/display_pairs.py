@@ -1,99 +1,160 @@
-import json
+import os
 import numpy as np
-from collections import Counter
+import orjson
+
+PAIRS_FILE = 'decimal_inches_pairs.json'
+
+# Parsed pairs and their reference analysis per pairs file, keyed on (path, mtime)
+_PAIRS_CACHE = {}
+
+def _parse_value(value):
+    """Parse a pair value like '12.5"' to float, or None if it isn't numeric"""
+    try:
+        return float(str(value).strip('"'))
+    except (ValueError, TypeError):
+        return None
+
+def _to_floats(pairs):
+    """Decimal and inches values of all pairs as float arrays, plus a mask of pairs where both parse"""
+    parsed = [
+        (_parse_value(pair.get('decimal_value', '0')), _parse_value(pair.get('inches_value', '0')))
+        for pair in pairs
+    ]
+    valid = np.array([dec is not None and inc is not None for dec, inc in parsed], dtype=bool)
+    # Unparseable pairs become NaN so they never pass a tolerance test
+    values = np.array([(dec, inc) if ok else (np.nan, np.nan) for (dec, inc), ok in zip(parsed, valid)],
+                      dtype=np.float64).reshape(-1, 2)
+    return values[:, 0], values[:, 1], valid
 
 def calculate_reference_candidates(pairs):
     """Calculate potential reference values from all pairs"""
-    references = []
-    
-    for pair in pairs:
-        try:
-            decimal_val = float(str(pair.get('decimal_value', '0')).strip('"'))
-            inches_val = float(str(pair.get('inches_value', '0')).strip('"'))
-            
-            # reference = decimal - inches
-            reference = decimal_val - inches_val
-            references.append(reference)
-            
-        except (ValueError, TypeError):
-            continue
+    dec, inc, valid = _to_floats(pairs)
     
-    return references
+    # reference = decimal - inches
+    return (dec[valid] - inc[valid]).tolist()
 
 def find_best_reference(references, tolerance=0.1):
     """Find the most common reference value within tolerance"""
     if not references:
         return None, []
     
-    # Round to nearest 0.01 to group similar values
-    rounded_refs = [round(ref, 2) for ref in references]
+    refs = np.asarray(references, dtype=np.float64)
     
-    # Count occurrences
-    ref_counts = Counter(rounded_refs)
+    # Round to nearest 0.01 to group similar values, and count occurrences
+    rounded_refs = np.round(refs, 2)
+    unique_refs, first_seen, counts = np.unique(rounded_refs, return_index=True, return_counts=True)
     
-    # Find the most common reference
-    best_ref, best_count = ref_counts.most_common(1)[0]
+    # Find the most common reference (ties go to the value seen first, as Counter.most_common does)
+    best = np.flatnonzero(counts == counts.max())
+    best_ref = float(unique_refs[best[np.argmin(first_seen[best])]])
     
     # Find all references within tolerance of the best one
-    consistent_refs = [ref for ref in references if abs(ref - best_ref) <= tolerance]
+    consistent_refs = refs[np.abs(refs - best_ref) <= tolerance].tolist()
     
     return best_ref, consistent_refs
 
-def analyze_pairs_with_reference(pairs, reference, tolerance=0.1):
-    """Analyze pairs against the reference and identify mistakes"""
-    correct_pairs = []
-    mistake_pairs = []
+def analyze_pairs_arrays(dec, inc, reference, tolerance=0.1):
+    """
+    Analyze pairs against the reference on value arrays, without building per-pair dicts
+
+    Returns (correct_mask, errors, expected) arrays; invalid (NaN) pairs are never correct.
+    """
+    # Calculate expected decimal based on reference, and check if actual decimal matches it
+    expected = reference * 12 + inc
+    errors = np.abs(dec * 12 - expected)
+    return errors <= tolerance, errors, expected
+
+def _iter_pair_records(pairs, dec, inc, valid, correct, errors, expected):
+    """Yield (status, record) for each pair in order from the analysis arrays, one dict at a time"""
+    decimal_vals, inc, expected, errors = ((dec * 12).tolist(), inc.tolist(), expected.tolist(), errors.tolist())
     
-    for i, pair in enumerate(pairs):
-        try:
-            decimal_val = float(str(pair.get('decimal_value', '0')).strip('"')) * 12
-            inches_val = float(str(pair.get('inches_value', '0')).strip('"'))
-            
-            # Calculate expected decimal based on reference
-            expected_decimal = reference * 12 + inches_val
-            
-            # Check if actual decimal matches expected (within tolerance)
-            error = abs(decimal_val - expected_decimal)
-            
-            if error <= tolerance:
-                correct_pairs.append({
-                    'pair_id': i + 1,
-                    'decimal': decimal_val,
-                    'inches': inches_val,
-                    'expected_decimal': expected_decimal,
-                    'error': error,
-                    'status': 'CORRECT'
-                })
-            else:
-                # This is a mistake - suggest correction
-                mistake_pairs.append({
-                    'pair_id': i + 1,
-                    'decimal': decimal_val,
-                    'inches': inches_val,
-                    'expected_decimal': expected_decimal,
-                    'error': error,
-                    'status': 'MISTAKE',
-                    'suggested_decimal': expected_decimal
-                })
-                
-        except (ValueError, TypeError):
-            mistake_pairs.append({
+    for i, (is_valid, is_correct) in enumerate(zip(valid.tolist(), correct.tolist())):
+        if is_correct:
+            yield 'CORRECT', {
+                'pair_id': i + 1,
+                'decimal': decimal_vals[i],
+                'inches': inc[i],
+                'expected_decimal': expected[i],
+                'error': errors[i],
+                'status': 'CORRECT'
+            }
+        elif is_valid:
+            # This is a mistake - suggest correction
+            yield 'MISTAKE', {
+                'pair_id': i + 1,
+                'decimal': decimal_vals[i],
+                'inches': inc[i],
+                'expected_decimal': expected[i],
+                'error': errors[i],
+                'status': 'MISTAKE',
+                'suggested_decimal': expected[i]
+            }
+        else:
+            yield 'INVALID_DATA', {
                 'pair_id': i + 1,
-                'decimal': pair.get('decimal_value', 'N/A'),
-                'inches': pair.get('inches_value', 'N/A'),
+                'decimal': pairs[i].get('decimal_value', 'N/A'),
+                'inches': pairs[i].get('inches_value', 'N/A'),
                 'expected_decimal': 'N/A',
                 'error': 'N/A',
                 'status': 'INVALID_DATA'
-            })
+            }
+
+def iter_pair_analyses(pairs, reference, tolerance=0.1):
+    """Yield (status, record) for each pair in order, building one record dict at a time"""
+    dec, inc, valid = _to_floats(pairs)
+    correct, errors, expected = analyze_pairs_arrays(dec, inc, reference, tolerance)
+    yield from _iter_pair_records(pairs, dec, inc, valid, correct, errors, expected)
+
+def analyze_pairs_with_reference(pairs, reference, tolerance=0.1):
+    """Analyze pairs against the reference and identify mistakes"""
+    correct_pairs = []
+    mistake_pairs = []
+    
+    for status, record in iter_pair_analyses(pairs, reference, tolerance):
+        if status == 'CORRECT':
+            correct_pairs.append(record)
+        else:
+            mistake_pairs.append(record)
     
     return correct_pairs, mistake_pairs
 
+def analyze_pairs_file(json_file_path=PAIRS_FILE):
+    """
+    Load a pairs file and run the reference analysis, reusing the result until the file changes
+
+    Returns (pairs, references, best_reference, consistent_refs, correct_pairs, mistake_pairs);
+    best_reference and the remaining lists are None when no pair has valid numbers.
+    The returned lists are shared between calls and must not be mutated.
+    """
+    key = (json_file_path, os.path.getmtime(json_file_path))
+    cached = _PAIRS_CACHE.get(key)
+    if cached is not None:
+        return cached
+    
+    with open(json_file_path, 'rb') as f:
+        data = orjson.loads(f.read())
+    
+    pairs = data.get('pairs', [])
+    references = calculate_reference_candidates(pairs)
+    if references:
+        best_reference, consistent_refs = find_best_reference(references)
+        correct_pairs, mistake_pairs = analyze_pairs_with_reference(pairs, best_reference)
+    else:
+        best_reference = consistent_refs = correct_pairs = mistake_pairs = None
+    
+    result = (pairs, references, best_reference, consistent_refs, correct_pairs, mistake_pairs)
+    # Keep only the latest version of each file
+    for stale in [k for k in _PAIRS_CACHE if k[0] == json_file_path]:
+        del _PAIRS_CACHE[stale]
+    _PAIRS_CACHE[key] = result
+    return result
+
 def load_and_display_pairs(json_file_path='decimal_inches_pairs.json'):
     """Load decimal-inches pairs and analyze with reference calculation"""
     
     try:
-        with open(json_file_path, 'r') as f:
-            data = json.load(f)
+        with open(json_file_path, 'rb') as f:
+            data = orjson.loads(f.read())
         
         pairs = data.get('pairs', [])
         total_pairs = len(pairs)
@@ -117,15 +178,25 @@ def load_and_display_pairs(json_file_path='decimal_inches_pairs.json'):
         print(f"Reference equation: decimal = {best_reference:.2f} + inches")
         print("=" * 60)
         
-        # Analyze pairs with the reference
-        correct_pairs, mistake_pairs = analyze_pairs_with_reference(pairs, best_reference)
+        # Analyze pairs with the reference; counts come from the masks so each
+        # correct row can be printed as soon as its record is built
+        dec, inc, valid = _to_floats(pairs)
+        correct, errors, expected = analyze_pairs_arrays(dec, inc, best_reference)
         
-        print(f"\nCORRECT PAIRS ({len(correct_pairs)}):")
+        print(f"\nCORRECT PAIRS ({int(np.count_nonzero(correct))}):")
         print("-" * 60)
         print("Pair ID | Decimal | Inches | Expected | Error")
         print("-" * 60)
-        for pair in correct_pairs:
-            print(f"{pair['pair_id']:<7} | {pair['decimal']:<7} | {pair['inches']:<6} | {pair['expected_decimal']:<8.2f} | {pair['error']:<5.3f}")
+        
+        # Records are still kept because the saved analysis file lists every pair
+        correct_pairs = []
+        mistake_pairs = []
+        for status, pair in _iter_pair_records(pairs, dec, inc, valid, correct, errors, expected):
+            if status == 'CORRECT':
+                print(f"{pair['pair_id']:<7} | {pair['decimal']:<7} | {pair['inches']:<6} | {pair['expected_decimal']:<8.2f} | {pair['error']:<5.3f}")
+                correct_pairs.append(pair)
+            else:
+                mistake_pairs.append(pair)
         
         if mistake_pairs:
             print(f"\nMISTAKES FOUND ({len(mistake_pairs)}):")
@@ -156,14 +227,14 @@ def load_and_display_pairs(json_file_path='decimal_inches_pairs.json'):
             'mistakes_data': mistake_pairs
         }
         
-        with open('reference_analysis.json', 'w') as f:
-            json.dump(results, f, indent=2)
+        with open('reference_analysis.json', 'wb') as f:
+            f.write(orjson.dumps(results, option=orjson.OPT_INDENT_2))
         
         print(f"\nDetailed analysis saved to: reference_analysis.json")
         
     except FileNotFoundError:
         print(f"Error: File '{json_file_path}' not found.")
-    except json.JSONDecodeError:
+    except orjson.JSONDecodeError:
         print(f"Error: Invalid JSON in '{json_file_path}'.")
     except Exception as e:
         print(f"Error: {str(e)}")
@@ -206,18 +277,13 @@ def display_pairs_tool(project_id: int, sheet_code: str = None):
         
         # EXACT display_pairs.py logic
         try:
-            with open('decimal_inches_pairs.json', 'r') as f:
-                data = json.load(f)
-            
-            pairs = data.get('pairs', [])
+            (pairs, references, best_reference, consistent_refs,
+             correct_pairs, mistake_pairs) = analyze_pairs_file(PAIRS_FILE)
             total_pairs = len(pairs)
             
             print(f"Total pairs: {total_pairs}")
             print("=" * 60)
             
-            # Calculate reference values
-            references = calculate_reference_candidates(pairs)
-            
             if not references:
                 db.close()
                 return {
@@ -225,18 +291,12 @@ def display_pairs_tool(project_id: int, sheet_code: str = None):
                     'error': 'No valid numerical pairs found.'
                 }
             
-            # Find the best reference
-            best_reference, consistent_refs = find_best_reference(references)
-            
             print(f"REFERENCE ANALYSIS:")
             print(f"Most likely reference value: {best_reference:.2f}")
             print(f"Number of pairs supporting this reference: {len(consistent_refs)}/{len(references)}")
             print(f"Reference equation: decimal = {best_reference:.2f} + inches")
             print("=" * 60)
             
-            # Analyze pairs with the reference
-            correct_pairs, mistake_pairs = analyze_pairs_with_reference(pairs, best_reference)
-            
             print(f"\nCORRECT PAIRS ({len(correct_pairs)}):")
             print("-" * 60)
             print("Pair ID | Decimal | Inches | Expected | Error")
@@ -273,8 +333,8 @@ def display_pairs_tool(project_id: int, sheet_code: str = None):
                 'mistakes_data': mistake_pairs
             }
             
-            with open('reference_analysis.json', 'w') as f:
-                json.dump(results, f, indent=2)
+            with open('reference_analysis.json', 'wb') as f:
+                f.write(orjson.dumps(results, option=orjson.OPT_INDENT_2))
             
             print(f"\nDetailed analysis saved to: reference_analysis.json")
             
@@ -299,7 +359,7 @@ def display_pairs_tool(project_id: int, sheet_code: str = None):
                 'success': False,
                 'error': 'File decimal_inches_pairs.json not found.'
             }
-        except json.JSONDecodeError:
+        except orjson.JSONDecodeError:
             db.close()
             return {
                 'success': False,
@@ -1,12 +1,19 @@
 import fitz
-from PIL import Image, ImageDraw, ImageFont
 import base64
-import io
 import json
 import numpy as np
+from scipy.spatial import cKDTree
+from pdf_cache import open_pdf, PDF_LOCK
+
+# Path operators that mark a curved outline (ovals, bubbles) rather than an arrow head
+CURVE_ITEM_TYPES = frozenset(('c', 'v', 'y'))
 
 def is_potential_arrow(drawing):
     """Determine if a drawing could be an arrow head"""
+    # Check if it's a filled AND stroked shape (arrows are specifically 'fs' type)
+    if drawing.get('type', '') != 'fs':
+        return False
+    
     rect = drawing.get('rect')
     if not rect:
         return False
@@ -25,141 +32,88 @@ def is_potential_arrow(drawing):
         if aspect_ratio > 5:  # Too elongated
             return False
     
-    # Check if it's a filled AND stroked shape (arrows are specifically 'fs' type)
-    drawing_type = drawing.get('type', '')
-    if drawing_type != 'fs':
-        return False
-    
     # Check drawing items - arrows should have line segments, not curves
     items = drawing.get('items', [])
     if len(items) < 2:  # Need multiple items for arrow shape
         return False
     
-    # Count line segments and check for curves
-    line_count = 0
-    has_curves = False
-    
-    for item in items:
-        if isinstance(item, dict):
-            item_type = item.get('type', '')
-            if item_type == 'l':  # Line segment
-                line_count += 1
-            elif item_type in ['c', 'v', 'y']:  # Curve types (cubic bezier, etc)
-                has_curves = True
-        elif isinstance(item, tuple) and len(item) > 0:
-            item_type = item[0]
-            if item_type == 'l':  # Line segment
-                line_count += 1
-            elif item_type in ['c', 'v', 'y']:  # Curve types
-                has_curves = True
+    # PyMuPDF path items are tuples led by their operator ('l' line, 'c' curve, ...)
+    item_types = [item[0] for item in items]
     
     # Arrows should have line segments, not curves (ovals have curves)
-    if has_curves:
+    if not CURVE_ITEM_TYPES.isdisjoint(item_types):
         return False
     
     # Need at least 2 line segments for arrow head
-    if line_count >= 2:
-        return True
-    
-    return False
+    return item_types.count('l') >= 2
 
 def detect_arrows(page):
-    """Detect arrow heads on the page using the same logic as arrow_detector.py"""
+    """
+    Detect arrow heads on the page using the same logic as arrow_detector.py.
+    Returns parallel arrays: 'center' (M, 2), 'bbox' (M, 4) as x, y, width, height,
+    and 'drawing_id' (M,). Arrow j is ARROW_{j+1}.
+    """
     drawings = page.get_drawings()
-    arrows = []
+    corners = []
+    drawing_ids = []
     
     for i, drawing in enumerate(drawings):
         if is_potential_arrow(drawing):
             rect = drawing.get('rect')
             if rect:
-                arrows.append({
-                    'id': f'ARROW_{len(arrows)+1}',
-                    'center': ((rect.x0 + rect.x1) / 2, (rect.y0 + rect.y1) / 2),
-                    'bbox': {
-                        'x': rect.x0,
-                        'y': rect.y0,
-                        'width': rect.x1 - rect.x0,
-                        'height': rect.y1 - rect.y0
-                    },
-                    'drawing_id': i,
-                    'rect': rect
-                })
+                corners.append((rect.x0, rect.y0, rect.x1, rect.y1))
+                drawing_ids.append(i)
     
-    return arrows
+    corners = np.array(corners, dtype=np.float64).reshape(-1, 4)
+    return {
+        'center': (corners[:, :2] + corners[:, 2:]) / 2,
+        'bbox': np.hstack([corners[:, :2], corners[:, 2:] - corners[:, :2]]),
+        'drawing_id': np.array(drawing_ids, dtype=np.int64)
+    }
 
-def find_nearby_arrows(el_center, arrows, max_distance=50):
-    """Find arrows within max_distance of an EL text center"""
-    nearby_arrows = []
-    el_x, el_y = el_center
-    
-    for arrow in arrows:
-        arrow_x, arrow_y = arrow['center']
-        distance = np.sqrt((el_x - arrow_x)**2 + (el_y - arrow_y)**2)
-        
-        if distance <= max_distance:
-            nearby_arrows.append({
-                'arrow_id': arrow['id'],
-                'distance': float(distance),
-                'arrow_center': arrow['center'],
-                'arrow_bbox': arrow['bbox'],
-                'arrow': arrow  # Keep full arrow data for assignment
-            })
-    
-    return nearby_arrows
+def arrow_record(arrows, j, distance):
+    """Dict form of arrow j as stored under an EL's nearby_arrows"""
+    x, y, width, height = arrows['bbox'][j].tolist()
+    return {
+        'arrow_id': f'ARROW_{j+1}',
+        'distance': distance,
+        'arrow_center': tuple(arrows['center'][j].tolist()),
+        'arrow_bbox': {'x': x, 'y': y, 'width': width, 'height': height}
+    }
 
 def assign_arrows_to_closest_el(el_boxes, arrows, max_distance=50):
-    """Two-phase arrow assignment: filter then assign to closest EL"""
-    
-    # Phase 1: Collect all arrows within threshold of ANY EL
-    candidate_arrows = set()
-    el_centers = []
-    
-    for i, (x, y, w, h, text, _) in enumerate(el_boxes):
-        # Calculate center of EL text (in original coordinates)
-        el_center_x = (x/2 + (x+w)/2) / 2  # Convert back from 2x scale
-        el_center_y = (y/2 + (y+h)/2) / 2
-        el_centers.append((el_center_x, el_center_y, i))
-        
-        # Find arrows within threshold
-        nearby = find_nearby_arrows((el_center_x, el_center_y), arrows, max_distance)
-        for arrow_data in nearby:
-            candidate_arrows.add(arrow_data['arrow']['id'])
-    
-    # Phase 2: Assign each candidate arrow to its closest EL
-    arrow_assignments = {}  # arrow_id -> (el_index, distance)
-    
-    for arrow in arrows:
-        if arrow['id'] in candidate_arrows:
-            closest_el = None
-            min_distance = float('inf')
-            
-            for el_center_x, el_center_y, el_idx in el_centers:
-                arrow_x, arrow_y = arrow['center']
-                distance = np.sqrt((el_center_x - arrow_x)**2 + (el_center_y - arrow_y)**2)
-                
-                if distance < min_distance:
-                    min_distance = distance
-                    closest_el = el_idx
-            
-            if closest_el is not None:
-                arrow_assignments[arrow['id']] = (closest_el, min_distance, arrow)
+    """
+    Two-phase arrow assignment: filter then assign to closest EL.
+    el_boxes is an (N, 4) array of x, y, w, h at 2x scale. Returns the closest EL
+    index per arrow (-1 when none is within max_distance) and that distance.
+    """
+    arrow_centers = arrows['center']
+    closest_el = np.full(len(arrow_centers), -1, dtype=np.int64)
+    min_distance = np.full(len(arrow_centers), np.inf)
+    if len(el_boxes) == 0 or len(arrow_centers) == 0:
+        return closest_el, min_distance
     
-    # Convert assignments back to el_boxes format
-    el_arrow_assignments = [[] for _ in range(len(el_boxes))]
+    # Centers of EL text (in original coordinates, converted back from 2x scale)
+    boxes = np.asarray(el_boxes, dtype=np.float64)
+    el_centers = (boxes[:, :2] / 2 + (boxes[:, :2] + boxes[:, 2:]) / 2) / 2
     
-    for arrow_id, (el_idx, distance, arrow) in arrow_assignments.items():
-        el_arrow_assignments[el_idx].append({
-            'arrow_id': arrow_id,
-            'distance': float(distance),
-            'arrow_center': arrow['center'],
-            'arrow_bbox': arrow['bbox']
-        })
+    # Phase 2: closest EL per arrow from a KD-tree over the EL centers. Phase 1 (an arrow
+    # within the threshold of ANY EL) is the same as its closest EL being within the
+    # threshold, so the bounded query (inf past the threshold) does both at once.
+    # Arrows are independent, so the queries are spread over all cores (workers=-1).
+    distance, nearest = cKDTree(el_centers).query(
+        arrow_centers, k=1, distance_upper_bound=np.nextafter(max_distance, np.inf), workers=-1)
+    candidates = distance <= max_distance
+    closest_el[candidates] = nearest[candidates]
+    min_distance[candidates] = distance[candidates]
     
-    return el_arrow_assignments
+    return closest_el, min_distance
 
-def show_el_vectors(project_id: int, sheet_code: str = None):
+def show_el_vectors(project_id: int, sheet_code: str = None, debug: bool = False):
     """
-    Extract EL vectors using el_vector_detector logic
+    Extract EL vectors using el_vector_detector logic.
+    el_detections.json is always written for the alignment step; the overlay
+    SVG (and the page render behind it) only when debug is set.
     """
     try:
         from database import SessionLocal, Sheet, Document, Project
@@ -197,124 +151,84 @@ def show_el_vectors(project_id: int, sheet_code: str = None):
         sheet = sheets[0]
         
         # EXACT el_vector_detector.py logic
-        doc = fitz.open(pdf_path)
-        page = doc[sheet.page - 1]
-        
-        # Detect arrows first
-        arrows = detect_arrows(page)
-        
-        pix = page.get_pixmap(matrix=fitz.Matrix(2, 2))
-        img = Image.frombytes("RGB", [pix.width, pix.height], pix.samples)
-        
-        # Create highlighted image with prefix overlay
-        highlighted_img = img.copy()
-        draw = ImageDraw.Draw(highlighted_img)
-        
-        try:
-            # Try to use a reasonably sized font
-            font = ImageFont.truetype("/System/Library/Fonts/Arial.ttf", 16)
-            small_font = ImageFont.truetype("/System/Library/Fonts/Arial.ttf", 12)
-        except:
-            # Fallback to default font
-            font = ImageFont.load_default()
-            small_font = ImageFont.load_default()
+        doc = open_pdf(pdf_path)
+        with PDF_LOCK:
+            page = doc[sheet.page - 1]
+            
+            # Detect arrows first
+            arrows = detect_arrows(page)
+            
+            # Spans only: without TEXT_PRESERVE_IMAGES, image blocks (and their pixel
+            # data) are never built
+            text_instances = page.get_text("dict", flags=fitz.TEXTFLAGS_DICT & ~fitz.TEXT_PRESERVE_IMAGES)
+            
+            # The page image is only a debug backdrop, so render it at 1x and let the SVG
+            # scale it up to the 2x coordinates the EL and arrow boxes use
+            pix = page.get_pixmap(colorspace=fitz.csRGB, alpha=False, annots=False) if debug else None
         
-        text_instances = page.get_text("dict")
+        # Flatten blocks -> lines -> spans in one pass and keep the "EL." spans
+        spans = (span for block in text_instances["blocks"] if "lines" in block
+                 for line in block["lines"] for span in line["spans"])
+        el_spans = [(span["bbox"], text) for span in spans
+                    for text in (span["text"].strip(),) if text[:3].upper() == "EL."]
+        el_texts = [text for _, text in el_spans]
         
-        el_boxes = []
-        for block in text_instances["blocks"]:
-            if "lines" in block:
-                for line in block["lines"]:
-                    for span in line["spans"]:
-                        text = span["text"].strip()
-                        if text.upper().startswith("EL."):
-                            bbox = span["bbox"]
-                            x = int(bbox[0] * 2)
-                            y = int(bbox[1] * 2)
-                            w = int((bbox[2] - bbox[0]) * 2)
-                            h = int((bbox[3] - bbox[1]) * 2)
-                            
-                            # Store without nearby_arrows for now
-                            el_boxes.append((x, y, w, h, text, []))
+        # x, y, w, h at 2x scale, truncated like int()
+        bboxes = np.array([bbox for bbox, _ in el_spans], dtype=np.float64).reshape(-1, 4)
+        el_boxes = (np.hstack([bboxes[:, :2], bboxes[:, 2:] - bboxes[:, :2]]) * 2).astype(np.int32)
         
         # Perform two-phase arrow assignment
-        el_arrow_assignments = assign_arrows_to_closest_el(el_boxes, arrows, max_distance=150)
+        arrow_el, arrow_distance = assign_arrows_to_closest_el(el_boxes, arrows, max_distance=150)
         
-        # Update el_boxes with assignments
-        for i in range(len(el_boxes)):
-            x, y, w, h, text, _ = el_boxes[i]
-            el_boxes[i] = (x, y, w, h, text, el_arrow_assignments[i])
+        # Assigned arrows grouped by EL, keeping arrow order within each EL
+        assigned = np.flatnonzero(arrow_el >= 0)
+        assigned = assigned[np.argsort(arrow_el[assigned], kind='stable')]
+        nearby = [[] for _ in el_texts]
+        for j in assigned.tolist():
+            nearby[arrow_el[j]].append(j)
         
-        # Add prefix highlighting to the image
-        # FIRST highlight EL texts
-        for i, (x, y, w, h, text, nearby_arrows) in enumerate(el_boxes):
-            el_id = f"EL_{i+1}"
+        if debug:
+            width, height = pix.width * 2, pix.height * 2
             
-            # Draw EL text bounding box
-            draw.rectangle([x, y, x + w, y + h], outline="green", width=3)
+            img_data = base64.b64encode(pix.tobytes("png")).decode()
             
-            # Add EL prefix label above the box
-            text_x = x
-            text_y = max(0, y - 25)
+            svg_parts = [
+                f'<svg width="{width}" height="{height}" xmlns="http://www.w3.org/2000/svg">',
+                f'<image href="data:image/png;base64,{img_data}" width="{width}" height="{height}"/>'
+            ]
             
-            # Draw text background for better visibility
-            text_bbox = draw.textbbox((text_x, text_y), el_id, font=font)
-            draw.rectangle(text_bbox, fill="yellow", outline="green")
+            # One pass over the ELs fills two layers: EL boxes below, their arrows on top
+            arrow_boxes = (arrows['bbox'] * 2).astype(np.int64).tolist()
+            el_layer = []
+            arrow_layer = []
+            for i, (x, y, w, h) in enumerate(el_boxes.tolist()):
+                el_id = f"EL_{i+1}"
+                el_layer.append(f'<rect x="{x}" y="{y}" width="{w}" height="{h}" fill="none" stroke="green" stroke-width="3"/>')
+                el_layer.append(f'<text x="{x}" y="{max(16, y - 9)}" fill="green" font-size="16" stroke="yellow" stroke-width="3" paint-order="stroke">{el_id}</text>')
+                
+                # Label each nearby arrow with its EL (not ARROW_X)
+                for j in nearby[i]:
+                    arrow_x, arrow_y, arrow_w, arrow_h = arrow_boxes[j]
+                    arrow_layer.append(f'<rect x="{arrow_x}" y="{arrow_y}" width="{arrow_w}" height="{arrow_h}" fill="none" stroke="red" stroke-width="2"/>')
+                    arrow_layer.append(f'<text x="{arrow_x}" y="{max(12, arrow_y - 8)}" fill="red" font-size="12" stroke="yellow" stroke-width="3" paint-order="stroke">{el_id}</text>')
             
-            # Draw the EL prefix text
-            draw.text((text_x, text_y), el_id, fill="green", font=font)
-        
-        # THEN highlight ONLY nearby arrows with EL labels
-        for i, (x, y, w, h, text, nearby_arrows) in enumerate(el_boxes):
-            el_id = f"EL_{i+1}"
+            svg_parts.extend(el_layer)
+            svg_parts.extend(arrow_layer)
+            svg_parts.append('</svg>')
             
-            # Draw only the nearby arrows for this EL
-            for arrow in nearby_arrows:
-                arrow_x = int(arrow['arrow_bbox']['x'] * 2)
-                arrow_y = int(arrow['arrow_bbox']['y'] * 2)
-                arrow_w = int(arrow['arrow_bbox']['width'] * 2)
-                arrow_h = int(arrow['arrow_bbox']['height'] * 2)
-                
-                # Draw arrow bounding box
-                draw.rectangle([arrow_x, arrow_y, arrow_x + arrow_w, arrow_y + arrow_h], outline="red", width=2)
-                
-                # Add EL label above the arrow (not ARROW_X)
-                text_x = arrow_x
-                text_y = max(0, arrow_y - 20)
-                
-                # Draw text background for better visibility
-                text_bbox = draw.textbbox((text_x, text_y), el_id, font=small_font)
-                draw.rectangle(text_bbox, fill="yellow", outline="red")
-                
-                # Draw the EL label on the arrow
-                draw.text((text_x, text_y), el_id, fill="red", font=small_font)
-        
-        # Save the highlighted image
-        highlighted_img.save('el_detection_highlighted.png')
-        
-        # Convert highlighted image to base64 for SVG
-        buf = io.BytesIO()
-        highlighted_img.save(buf, format='PNG')
-        img_data = base64.b64encode(buf.getvalue()).decode()
-        
-        svg_content = f'<svg width="{pix.width}" height="{pix.height}" xmlns="http://www.w3.org/2000/svg">\n'
-        svg_content += f'<image href="data:image/png;base64,{img_data}" width="{pix.width}" height="{pix.height}"/>\n'
-        svg_content += '</svg>'
-        
-        svg_content += '</svg>'
-        
-        with open('el_detection.svg', 'w') as f:
-            f.write(svg_content)
+            with open('el_detection.svg', 'w') as f:
+                f.write('\n'.join(svg_parts))
         
         # Output JSON with bounding boxes and nearby arrows
         el_json = {
             "page": sheet.page,
-            "total_arrows_detected": len(arrows),
+            "total_arrows_detected": len(arrows['center']),
             "detections": []
         }
         
-        for i, (x, y, w, h, text, nearby_arrows) in enumerate(el_boxes):
+        for i, ((x, y, w, h), text) in enumerate(zip(el_boxes.tolist(), el_texts)):
             el_base_id = f"EL_{i+1}"
+            nearby_arrows = [arrow_record(arrows, j, arrow_distance[j].item()) for j in nearby[i]]
             
             if len(nearby_arrows) == 0:
                 # No nearby arrows - create single EL entry
@@ -362,13 +276,12 @@ def show_el_vectors(project_id: int, sheet_code: str = None):
         with open('el_detections.json', 'w') as f:
             json.dump(el_json, f, indent=2)
         
-        doc.close()
         db.close()
         
         return {
             'success': True,
             'total_el_vectors': len(el_json["detections"]),
-            'total_arrows_detected': len(arrows),
+            'total_arrows_detected': len(arrows['center']),
             'all_el_vectors': el_json["detections"]
         }
         
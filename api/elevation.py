@@ -1,11 +1,26 @@
 import fitz
 import easyocr
-from PIL import Image
 import base64
-import io
 import cv2
 import numpy as np
 import json
+import torch
+from pdf_cache import open_pdf, PDF_LOCK
+
+_READER = None
+
+# Patches per readtext_batched call; bounds detector memory on large sheets
+OCR_BATCH_SIZE = 16
+
+def get_reader():
+    """Return the process-wide EasyOCR reader, loading its weights on first use"""
+    global _READER
+    if _READER is None:
+        _READER = easyocr.Reader(['en'], gpu=True, detector=True, recognizer=True)
+        if torch.cuda.is_available():
+            # Padded OCR batches share one shape, so cuDNN autotuning pays off after the first batch
+            torch.backends.cudnn.benchmark = True
+    return _READER
 
 def calculate_iou(box1, box2):
     """Calculate IoU between two bounding boxes (x, y, w, h)"""
@@ -33,40 +48,58 @@ def filter_overlapping_boxes(door_boxes, iou_threshold=0.5):
     if len(door_boxes) <= 1:
         return door_boxes
     
-    # Sort by confidence (extract from text field)
-    boxes_with_conf = []
+    # Extract confidence from text like "DOOR (P3 -45° 0.87)"
+    confidences = []
     for box in door_boxes:
-        x, y, w, h, text = box
-        # Extract confidence from text like "DOOR (P3 -45° 0.87)"
         try:
-            conf = float(text.split()[-1].rstrip(')'))
+            confidences.append(float(box[4].split()[-1].rstrip(')')))
         except:
-            conf = 0.5  # default confidence
-        boxes_with_conf.append((x, y, w, h, text, conf))
+            confidences.append(0.5)  # default confidence
     
-    # Sort by confidence (highest first)
-    boxes_with_conf.sort(key=lambda x: x[5], reverse=True)
+    boxes = np.array([box[:4] for box in door_boxes], dtype=np.float64)
+    x1, y1 = boxes[:, 0], boxes[:, 1]
+    x2, y2 = x1 + boxes[:, 2], y1 + boxes[:, 3]
+    area = boxes[:, 2] * boxes[:, 3]
     
-    filtered_boxes = []
-    for i, (x1, y1, w1, h1, text1, conf1) in enumerate(boxes_with_conf):
-        keep = True
-        for x2, y2, w2, h2, text2 in filtered_boxes:
-            iou = calculate_iou((x1, y1, w1, h1), (x2, y2, w2, h2))
-            if iou > iou_threshold:
-                keep = False
-                break
-        
+    # Greedy NMS in descending confidence; stable so ties keep input order
+    keep = []
+    for i in np.argsort(-np.array(confidences), kind='stable'):
         if keep:
-            filtered_boxes.append((x1, y1, w1, h1, text1))
+            k = np.array(keep)
+            inter_w = np.maximum(0.0, np.minimum(x2[i], x2[k]) - np.maximum(x1[i], x1[k]))
+            inter_h = np.maximum(0.0, np.minimum(y2[i], y2[k]) - np.maximum(y1[i], y1[k]))
+            inter = inter_w * inter_h
+            union = area[i] + area[k] - inter
+            iou = np.divide(inter, union, out=np.zeros_like(inter), where=union > 0)
+            if np.any(iou > iou_threshold):
+                continue
+        keep.append(i)
+    
+    filtered_boxes = [door_boxes[i] for i in keep]
     
     print(f"Filtered {len(door_boxes) - len(filtered_boxes)} overlapping boxes (IoU > {iou_threshold})")
     return filtered_boxes
 
-def rotate_with_inverse(img, angle):
+def rotate_with_inverse(img, angle, expand=False):
+    """
+    Rotate img about its center and return it with the inverse affine map.
+    With expand, the canvas grows to the rotated bounding box (w|cos| + h|sin|,
+    h|cos| + w|sin|) so no part of img is cut off; the new margin is white.
+    """
     h, w = img.shape[:2]
     center = ((w - 1) / 2.0, (h - 1) / 2.0)
     M = cv2.getRotationMatrix2D(center, angle, 1.0)
-    rotated = cv2.warpAffine(img, M, (w, h), flags=cv2.INTER_CUBIC, borderMode=cv2.BORDER_REPLICATE)
+    if expand:
+        cos, sin = abs(M[0, 0]), abs(M[0, 1])
+        out_w = int(np.ceil(w * cos + h * sin))
+        out_h = int(np.ceil(h * cos + w * sin))
+        # Shift so the rotated center lands on the center of the larger canvas
+        M[0, 2] += (out_w - w) / 2.0
+        M[1, 2] += (out_h - h) / 2.0
+        rotated = cv2.warpAffine(img, M, (out_w, out_h), flags=cv2.INTER_CUBIC,
+                                 borderMode=cv2.BORDER_CONSTANT, borderValue=(255, 255, 255))
+    else:
+        rotated = cv2.warpAffine(img, M, (w, h), flags=cv2.INTER_CUBIC, borderMode=cv2.BORDER_REPLICATE)
     Minv = cv2.invertAffineTransform(M)
     return rotated, Minv
 
@@ -101,9 +134,38 @@ def create_patches(img, overlap_ratio=0.2):
     
     return patches
 
-def show_exterior_elevations(project_id: int, sheet_code: str = None):
+def pad_to_shape(img, height, width):
+    """Pad an image on the bottom/right with white so its pixel coordinates are unchanged"""
+    h, w = img.shape[:2]
+    if h == height and w == width:
+        return img
+    return cv2.copyMakeBorder(img, 0, height - h, 0, width - w, cv2.BORDER_CONSTANT, value=(255, 255, 255))
+
+def ocr_batch(reader, batch):
+    """Pad one batch to a common shape and run it through readtext_batched"""
+    height = max(img.shape[0] for img in batch)
+    width = max(img.shape[1] for img in batch)
+    return reader.readtext_batched([pad_to_shape(img, height, width) for img in batch], batch_size=len(batch))
+
+def ocr_patches(reader, images, batch_size=OCR_BATCH_SIZE):
     """
-    Extract elevations using door_detector logic
+    Run EasyOCR over a list of images in fixed-size batches.
+    readtext_batched needs equally sized inputs, so each batch is padded to its
+    largest image instead of resized, keeping boxes in patch coordinates.
+    Results come back in input order. Batches run one after another on the shared
+    reader: EasyOCR does not document Reader as thread-safe, and the batches
+    would serialize on the GPU anyway.
+    """
+    results = []
+    for start in range(0, len(images), batch_size):
+        results.extend(ocr_batch(reader, images[start:start + batch_size]))
+    return results
+
+def show_exterior_elevations(project_id: int, sheet_code: str = None, debug: bool = False):
+    """
+    Extract elevations using door_detector logic.
+    door_detections.json is always written for the alignment step; the debug
+    PNG/SVG/flat JSON artifacts only when debug is set.
     """
     try:
         from database import SessionLocal, Sheet, Document, Project
@@ -141,70 +203,88 @@ def show_exterior_elevations(project_id: int, sheet_code: str = None):
         sheet = sheets[0]
         
         # EXACT door_detector.py logic
-        doc = fitz.open(pdf_path)
-        page = doc[sheet.page - 1]
-        
-        pix = page.get_pixmap(matrix=fitz.Matrix(2, 2))
-        img = Image.frombytes("RGB", [pix.width, pix.height], pix.samples)
-        img_cv = cv2.cvtColor(np.array(img), cv2.COLOR_RGB2BGR)
+        doc = open_pdf(pdf_path)
+        with PDF_LOCK:
+            page = doc[sheet.page - 1]
+            
+            # OCR needs the 2x raster; read it straight from the pixmap buffer instead of via PIL.
+            # The view is read-only, so the BGR conversion is the one full-image copy.
+            pix = page.get_pixmap(matrix=fitz.Matrix(2, 2), colorspace=fitz.csRGB, alpha=False, annots=False)
+        samples = np.frombuffer(pix.samples_mv, dtype=np.uint8).reshape(pix.height, pix.width, 3)
+        img_cv = cv2.cvtColor(samples, cv2.COLOR_RGB2BGR)
         
-        reader = easyocr.Reader(['en'])
+        reader = get_reader()
         
         door_boxes = []
         angles = [0, -45, 45]
         patches = create_patches(img_cv)
         
+        # Rotate the whole page once per angle onto a canvas large enough to hold all
+        # of it, and cut a 4x4 grid from that. Each patch's inverse map (page inverse
+        # composed with the patch offset) goes straight back to page coordinates, so
+        # rotated jobs carry no offset.
+        rotated_patches = {}
+        for angle in angles[1:]:
+            rotated, Minv = rotate_with_inverse(img_cv, angle, expand=True)
+            rotated_patches[angle] = []
+            for test_patch, offset_x, offset_y in create_patches(rotated):
+                Minv_patch = Minv.copy()
+                Minv_patch[:, 2] += Minv[:, :2] @ (offset_x, offset_y)
+                rotated_patches[angle].append((test_patch, Minv_patch))
+        
+        # Every (patch, angle) pair; OCR then runs as a few batched calls.
+        # The first field is the image whose bounds rotated boxes are clipped to.
+        jobs = []
         for patch_idx, (patch, offset_x, offset_y) in enumerate(patches):
-            print(f"Processing patch {patch_idx + 1}/16")
-            
             for angle in angles:
                 if angle == 0:
-                    test_patch = patch
-                    results = reader.readtext(test_patch)
-                    
-                    for (bbox, text, confidence) in results:
-                        if 'DOOR' in text.upper() and confidence > 0.5:
-                            x_coords = [point[0] for point in bbox]
-                            y_coords = [point[1] for point in bbox]
-                            patch_x = int(min(x_coords))
-                            patch_y = int(min(y_coords))
-                            patch_w = int(max(x_coords) - min(x_coords))
-                            patch_h = int(max(y_coords) - min(y_coords))
-                            
-                            final_x = patch_x + offset_x
-                            final_y = patch_y + offset_y
-                            
-                            door_boxes.append((final_x, final_y, patch_w, patch_h, f"{text} (P{patch_idx+1} {angle}° {confidence:.2f})"))
+                    jobs.append((patch, patch, None, offset_x, offset_y, patch_idx, angle))
                 else:
-                    test_patch, Minv = rotate_with_inverse(patch, angle)
-                    results = reader.readtext(test_patch)
-                    
-                    for (bbox, text, confidence) in results:
-                        if 'DOOR' in text.upper() and confidence > 0.5:
-                            orig_pts = apply_affine(bbox, Minv)
-                            
-                            x_coords = orig_pts[:, 0]
-                            y_coords = orig_pts[:, 1]
-                            x_min = float(np.min(x_coords))
-                            y_min = float(np.min(y_coords))
-                            x_max = float(np.max(x_coords))
-                            y_max = float(np.max(y_coords))
-                            
-                            H, W = patch.shape[:2]
-                            x_min = max(0.0, min(x_min, W - 1.0))
-                            y_min = max(0.0, min(y_min, H - 1.0))
-                            x_max = max(0.0, min(x_max, W - 1.0))
-                            y_max = max(0.0, min(y_max, H - 1.0))
-                            
-                            patch_x = int(np.floor(x_min))
-                            patch_y = int(np.floor(y_min))
-                            rect_w = int(np.ceil(x_max - x_min))
-                            rect_h = int(np.ceil(y_max - y_min))
-                            
-                            final_x = patch_x + offset_x
-                            final_y = patch_y + offset_y
-                            
-                            door_boxes.append((final_x, final_y, rect_w, rect_h, f"{text} (P{patch_idx+1} {angle}° {confidence:.2f})"))
+                    test_patch, Minv_patch = rotated_patches[angle][patch_idx]
+                    jobs.append((img_cv, test_patch, Minv_patch, 0, 0, patch_idx, angle))
+        
+        all_results = ocr_patches(reader, [job[1] for job in jobs])
+        
+        for (bounds, _, Minv, offset_x, offset_y, patch_idx, angle), results in zip(jobs, all_results):
+            for (bbox, text, confidence) in results:
+                if 'DOOR' in text.upper() and confidence > 0.5:
+                    if Minv is None:
+                        x_coords = [point[0] for point in bbox]
+                        y_coords = [point[1] for point in bbox]
+                        patch_x = int(min(x_coords))
+                        patch_y = int(min(y_coords))
+                        patch_w = int(max(x_coords) - min(x_coords))
+                        patch_h = int(max(y_coords) - min(y_coords))
+                        
+                        final_x = patch_x + offset_x
+                        final_y = patch_y + offset_y
+                        
+                        door_boxes.append((final_x, final_y, patch_w, patch_h, f"{text} (P{patch_idx+1} {angle}° {confidence:.2f})"))
+                    else:
+                        orig_pts = apply_affine(bbox, Minv)
+                        
+                        x_coords = orig_pts[:, 0]
+                        y_coords = orig_pts[:, 1]
+                        x_min = float(np.min(x_coords))
+                        y_min = float(np.min(y_coords))
+                        x_max = float(np.max(x_coords))
+                        y_max = float(np.max(y_coords))
+                        
+                        H, W = bounds.shape[:2]
+                        x_min = max(0.0, min(x_min, W - 1.0))
+                        y_min = max(0.0, min(y_min, H - 1.0))
+                        x_max = max(0.0, min(x_max, W - 1.0))
+                        y_max = max(0.0, min(y_max, H - 1.0))
+                        
+                        patch_x = int(np.floor(x_min))
+                        patch_y = int(np.floor(y_min))
+                        rect_w = int(np.ceil(x_max - x_min))
+                        rect_h = int(np.ceil(y_max - y_min))
+                        
+                        final_x = patch_x + offset_x
+                        final_y = patch_y + offset_y
+                        
+                        door_boxes.append((final_x, final_y, rect_w, rect_h, f"{text} (P{patch_idx+1} {angle}° {confidence:.2f})"))
         
         # Filter overlapping detections from different patches
         print(f"\nFound {len(door_boxes)} total detections before filtering")
@@ -212,10 +292,11 @@ def show_exterior_elevations(project_id: int, sheet_code: str = None):
         print(f"Kept {len(door_boxes)} detections after IoU filtering")
         
         # Debug: draw rectangles on original image
-        dbg = img_cv.copy()
-        for x, y, w, h, _ in door_boxes:
-            cv2.rectangle(dbg, (x, y), (x+w, y+h), (0, 0, 255), 2)
-        cv2.imwrite('door_debug.png', dbg)
+        if debug:
+            dbg = img_cv.copy()
+            for x, y, w, h, _ in door_boxes:
+                cv2.rectangle(dbg, (x, y), (x+w, y+h), (0, 0, 255), 2)
+            cv2.imwrite('door_debug.png', dbg)
         
         # Output JSON with bounding boxes
         door_json = {
@@ -238,28 +319,26 @@ def show_exterior_elevations(project_id: int, sheet_code: str = None):
         with open('door_detections.json', 'w') as f:
             json.dump(door_json, f, indent=2)
         
-        buf = io.BytesIO()
-        img.save(buf, format='PNG')
-        img_data = base64.b64encode(buf.getvalue()).decode()
-        
-        svg_content = f'<svg width="{pix.width}" height="{pix.height}" xmlns="http://www.w3.org/2000/svg">\n'
-        svg_content += f'<image href="data:image/png;base64,{img_data}" width="{pix.width}" height="{pix.height}"/>\n'
-        
-        for i, (x, y, w, h, text) in enumerate(door_boxes):
-            svg_content += f'<rect x="{x}" y="{y}" width="{w}" height="{h}" fill="none" stroke="red" stroke-width="3"/>\n'
-            svg_content += f'<text x="{x}" y="{y-5}" fill="red" font-size="12">DOOR_{i+1}: {text}</text>\n'
-        
-        svg_content += '</svg>'
-        
-        with open('door_detection.svg', 'w') as f:
-            f.write(svg_content)
-        
-        # JSON output
-        json_output = [{"x": x, "y": y, "width": w, "height": h, "text": text} for x, y, w, h, text in door_boxes]
-        with open('door_detection.json', 'w') as json_file:
-            json.dump(json_output, json_file)
+        if debug:
+            img_data = base64.b64encode(pix.tobytes("png")).decode()
+            
+            svg_content = f'<svg width="{pix.width}" height="{pix.height}" xmlns="http://www.w3.org/2000/svg">\n'
+            svg_content += f'<image href="data:image/png;base64,{img_data}" width="{pix.width}" height="{pix.height}"/>\n'
+            
+            for i, (x, y, w, h, text) in enumerate(door_boxes):
+                svg_content += f'<rect x="{x}" y="{y}" width="{w}" height="{h}" fill="none" stroke="red" stroke-width="3"/>\n'
+                svg_content += f'<text x="{x}" y="{y-5}" fill="red" font-size="12">DOOR_{i+1}: {text}</text>\n'
+            
+            svg_content += '</svg>'
+            
+            with open('door_detection.svg', 'w') as f:
+                f.write(svg_content)
+            
+            # JSON output
+            json_output = [{"x": x, "y": y, "width": w, "height": h, "text": text} for x, y, w, h, text in door_boxes]
+            with open('door_detection.json', 'w') as json_file:
+                json.dump(json_output, json_file)
         
-        doc.close()
         db.close()
         
         return {
@@ -251,7 +251,7 @@ class LangGraphChatAgent:
                     })
                 
                 # Extract and save columns
-                result = extract_and_save_sheet_columns(sheet.id)
+                result = extract_and_save_sheet_columns(sheet.id, db)
                 
                 return json.dumps(result)
                 
@@ -309,7 +309,7 @@ class LangGraphChatAgent:
                     })
                 
                 # Extract and save walls
-                result = extract_and_save_sheet_walls(sheet.id)
+                result = extract_and_save_sheet_walls(sheet.id, db)
                 
                 return json.dumps(result)
                 
@@ -347,12 +347,12 @@ class LangGraphChatAgent:
                 # If no walls_data provided, fetch existing walls from database
                 if walls_data is None:
                     print(f"No walls_data provided, fetching existing walls for sheet {sheet.code}")
-                    existing_walls_result = get_sheet_walls(sheet.id)
+                    existing_walls_result = get_sheet_walls(sheet.id, db)
                     
                     if not existing_walls_result["success"] or not existing_walls_result["walls"]:
                         # Try to extract walls first
                         print(f"No existing walls found, extracting walls for sheet {sheet.code}")
-                        extraction_result = extract_and_save_sheet_walls(sheet.id)
+                        extraction_result = extract_and_save_sheet_walls(sheet.id, db)
                         
                         if not extraction_result["success"]:
                             return json.dumps({
@@ -361,7 +361,7 @@ class LangGraphChatAgent:
                             })
                         
                         # Get the extracted walls
-                        existing_walls_result = get_sheet_walls(sheet.id)
+                        existing_walls_result = get_sheet_walls(sheet.id, db)
                     
                     # Convert database walls to walls_data format
                     walls_data = []
@@ -907,7 +907,7 @@ class LangGraphChatAgent:
                     if not existing_columns_result["success"] or not existing_columns_result["columns"]:
                         # Try to extract columns first
                         print(f"No existing columns found, extracting columns for sheet {sheet.code}")
-                        extraction_result = extract_and_save_sheet_columns(sheet.id)
+                        extraction_result = extract_and_save_sheet_columns(sheet.id, db)
                         
                         if not extraction_result["success"]:
                             return json.dumps({
@@ -1348,7 +1348,7 @@ class LangGraphChatAgent:
                 print(f"Validating wall positions for sheet {sheet.code}")
                 
                 # Get walls for this sheet
-                walls_result = get_sheet_walls(sheet.id)
+                walls_result = get_sheet_walls(sheet.id, db)
                 if not walls_result["success"] or not walls_result["walls"]:
                     return json.dumps({
                         "success": False,
@@ -1995,6 +1995,21 @@ class LangGraphChatAgent:
                     except ValueError:
                         pass
                 
+                # Match #rrggbb hex values (PyMuPDF's get_svg_image); 8-bit channels can
+                # land up to half a step (0.5/255) from the target gray
+                hex_pattern = r'#([0-9a-f]{2})([0-9a-f]{2})([0-9a-f]{2})$'
+                match = re.match(hex_pattern, fill_value.strip(), re.IGNORECASE)
+                
+                if match:
+                    r, g, b = (int(channel, 16) / 255.0 for channel in match.groups())
+                    hex_tolerance = 0.5 / 255.0
+                    
+                    # Check if it matches our target RGB(0.754, 0.754, 0.754)
+                    if (abs(r - target_gray) <= hex_tolerance and 
+                        abs(g - target_gray) <= hex_tolerance and 
+                        abs(b - target_gray) <= hex_tolerance):
+                        return (r, g, b)
+                
                 return None
             
             # Define namespace for SVG elements
@@ -2267,6 +2282,21 @@ class LangGraphChatAgent:
                     except ValueError:
                         pass
                 
+                # Match #rrggbb hex values (PyMuPDF's get_svg_image); 8-bit channels can
+                # land up to half a step (0.5/255) from the target gray
+                hex_pattern = r'#([0-9a-f]{2})([0-9a-f]{2})([0-9a-f]{2})$'
+                match = re.match(hex_pattern, fill_value.strip(), re.IGNORECASE)
+                
+                if match:
+                    r, g, b = (int(channel, 16) / 255.0 for channel in match.groups())
+                    hex_tolerance = 0.5 / 255.0
+                    
+                    # Check if it matches our target RGB(0.754, 0.754, 0.754)
+                    if (abs(r - target_gray) <= hex_tolerance and 
+                        abs(g - target_gray) <= hex_tolerance and 
+                        abs(b - target_gray) <= hex_tolerance):
+                        return (r, g, b)
+                
                 return None
             
             # Find and mark elements with target fill color
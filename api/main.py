@@ -16,7 +16,7 @@ from datetime import datetime, timedelta
 import uuid
 from starlette.middleware.sessions import SessionMiddleware
 import multiprocessing
-from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import ProcessPoolExecutor, as_completed, TimeoutError as FuturesTimeoutError
 from pathlib import Path
 from datetime import datetime
 from dotenv import load_dotenv
@@ -27,7 +27,7 @@ from columns import extract_and_save_sheet_columns, get_sheet_columns
 from grid_lines import extract_and_save_sheet_grid_lines, get_sheet_grid_lines
 from toc import process_pdf_toc
 from sheet_processor import process_sheet
-from multiprocessing_workers import process_single_sheet_worker
+from multiprocessing_workers import process_single_sheet_worker, init_db_worker
 
 # Load environment variables
 load_dotenv()
@@ -408,7 +408,7 @@ async def extract_sheet_columns(sheet_id: int, db: Session = Depends(get_db)):
             raise HTTPException(status_code=404, detail="Sheet not found")
         
         # Extract and save columns
-        result = extract_and_save_sheet_columns(sheet_id)
+        result = extract_and_save_sheet_columns(sheet_id, db)
         
         if result["success"]:
             return {
@@ -1360,8 +1360,8 @@ def process_sheets_background(pdf_path: str, document_id: int, sheet_info: List[
     print(f"📊 Using {max_workers} parallel workers for {len(sheet_info)} sheets")
     
     try:
-        # Use ProcessPoolExecutor for parallel processing
-        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        # Use ProcessPoolExecutor for parallel processing; each worker sets up its DB engine once
+        with ProcessPoolExecutor(max_workers=max_workers, initializer=init_db_worker) as executor:
             # Submit all sheet processing tasks
             future_to_sheet = {
                 executor.submit(process_single_sheet_worker, sheet_data, pdf_path): sheet_data
@@ -1372,19 +1372,25 @@ def process_sheets_background(pdf_path: str, document_id: int, sheet_info: List[
             completed_count = 0
             failed_count = 0
             
-            for future in future_to_sheet:
-                sheet_data = future_to_sheet[future]
-                try:
-                    result = future.result(timeout=300)  # 5 minute timeout per sheet
-                    if result["success"]:
-                        completed_count += 1
-                        print(f"✅ Completed {completed_count}/{len(sheet_info)}: {result['sheet_code']}")
-                    else:
+            try:
+                # 5 minutes per sheet, the same worst case as waiting on each sheet in turn
+                for future in as_completed(future_to_sheet, timeout=300 * len(sheet_info)):
+                    sheet_data = future_to_sheet[future]
+                    try:
+                        result = future.result()
+                        if result["success"]:
+                            completed_count += 1
+                            print(f"✅ Completed {completed_count}/{len(sheet_info)}: {result['sheet_code']}")
+                        else:
+                            failed_count += 1
+                            print(f"❌ Failed {result['sheet_code']}: {result.get('error', 'Unknown error')}")
+                    except Exception as e:
                         failed_count += 1
-                        print(f"❌ Failed {result['sheet_code']}: {result.get('error', 'Unknown error')}")
-                except Exception as e:
-                    failed_count += 1
-                    print(f"❌ Exception processing {sheet_data.get('code', 'unknown')}: {e}")
+                        print(f"❌ Exception processing {sheet_data.get('code', 'unknown')}: {e}")
+            except FuturesTimeoutError:
+                pending = [sheet_data for future, sheet_data in future_to_sheet.items() if not future.done()]
+                failed_count += len(pending)
+                print(f"❌ Timed out waiting for {len(pending)} sheets: {', '.join(str(s.get('code', 'unknown')) for s in pending)}")
         
         end_time = time.time()
         processing_time = end_time - start_time
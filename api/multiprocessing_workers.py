@@ -3,16 +3,44 @@ Multiprocessing worker functions for sheet processing.
 These functions are in a separate module to avoid pickling issues.
 """
 import os
-from typing import Dict
+from typing import Dict, List, Tuple
+
+# Sheet status updates as single UPDATE ... RETURNING roundtrips; updated_at is set
+# here because raw SQL bypasses the model's onupdate (naive UTC, like datetime.utcnow)
+SET_SHEET_STATUS_SQL = """
+    UPDATE sheets SET status = :status, updated_at = now() AT TIME ZONE 'utc'
+    WHERE id = :sid RETURNING id
+"""
+COMPLETE_SHEET_SQL = """
+    UPDATE sheets SET status = 'completed', svg_path = :svg_path, updated_at = now() AT TIME ZONE 'utc'
+    WHERE id = :sid RETURNING id
+"""
+
+# Per-process session opened by init_db_worker and reused by every task in that worker
+_DB = None
+
+
+def init_db_worker():
+    """
+    Pool initializer: set up the database module once per worker process and drop
+    any pooled connections inherited from the parent through fork, so each worker
+    opens its own instead of sharing the parent's sockets. The session opened here
+    is reused for every sheet the worker handles and closes with the process.
+    """
+    global _DB
+    from database import engine, SessionLocal
+    engine.dispose(close=False)
+    _DB = SessionLocal()
 
 
 def process_single_sheet_worker(sheet_data: dict, pdf_path: str) -> Dict:
     """Worker function to process a single sheet - designed for multiprocessing"""
-    from database import SessionLocal, Sheet
+    from sqlalchemy import text
+    from database import SessionLocal
     from sheet_processor import process_sheet
     
-    # Create a fresh database connection for this process
-    db = SessionLocal()
+    # Reuse the worker's session; outside a pool (sequential fallback) open one for this call
+    db = _DB if _DB is not None else SessionLocal()
     try:
         sheet_id = sheet_data["id"]
         sheet_code = sheet_data["code"]
@@ -21,15 +49,14 @@ def process_single_sheet_worker(sheet_data: dict, pdf_path: str) -> Dict:
         print(f"🔄 Worker processing sheet {sheet_code} (PID: {os.getpid()})")
         
         # Update status to processing
-        db_sheet = db.query(Sheet).filter(Sheet.id == sheet_id).first()
-        if not db_sheet:
+        res = db.execute(text(SET_SHEET_STATUS_SQL), {"status": "processing", "sid": sheet_id})
+        if res.rowcount == 0:
+            db.rollback()
             return {
                 "sheet_id": sheet_id,
                 "success": False,
                 "error": f"Sheet {sheet_id} not found in database"
             }
-        
-        db_sheet.status = "processing"
         db.commit()
         
         # Process the sheet (CPU intensive operation)
@@ -37,8 +64,7 @@ def process_single_sheet_worker(sheet_data: dict, pdf_path: str) -> Dict:
         
         # Update the database with results
         if result.get("success") and result.get("svg_path"):
-            db_sheet.svg_path = result["svg_path"]
-            db_sheet.status = "completed"
+            db.execute(text(COMPLETE_SHEET_SQL), {"svg_path": result["svg_path"], "sid": sheet_id})
             print(f"✅ Worker: Sheet {sheet_code} completed (PID: {os.getpid()})")
             db.commit()
             return {
@@ -48,7 +74,7 @@ def process_single_sheet_worker(sheet_data: dict, pdf_path: str) -> Dict:
                 "svg_path": result["svg_path"]
             }
         else:
-            db_sheet.status = "error"
+            db.execute(text(SET_SHEET_STATUS_SQL), {"status": "error", "sid": sheet_id})
             db.commit()
             return {
                 "sheet_id": sheet_id,
@@ -61,10 +87,9 @@ def process_single_sheet_worker(sheet_data: dict, pdf_path: str) -> Dict:
         print(f"❌ Worker error processing sheet {sheet_data.get('code', 'unknown')}: {e}")
         # Update status to error
         try:
-            db_sheet = db.query(Sheet).filter(Sheet.id == sheet_data["id"]).first()
-            if db_sheet:
-                db_sheet.status = "error"
-                db.commit()
+            db.rollback()
+            db.execute(text(SET_SHEET_STATUS_SQL), {"status": "error", "sid": sheet_data["id"]})
+            db.commit()
         except Exception as update_error:
             print(f"❌ Failed to update error status: {update_error}")
         
@@ -75,4 +100,30 @@ def process_single_sheet_worker(sheet_data: dict, pdf_path: str) -> Dict:
             "error": str(e)
         }
     finally:
-        db.close()
\ No newline at end of file
+        if db is not _DB:
+            db.close()
+
+def extract_sheet_walls_worker(sheet_id: int) -> Dict:
+    """Worker function to extract and save walls for a single sheet - designed for multiprocessing"""
+    from walls import extract_and_save_sheet_walls
+    
+    print(f"🔄 Worker extracting walls for sheet {sheet_id} (PID: {os.getpid()})")
+    
+    # Reuse the worker's session from init_db_worker; outside a pool (_DB is None)
+    # extract_and_save_sheet_walls opens and closes its own
+    try:
+        return extract_and_save_sheet_walls(sheet_id, db=_DB)
+    finally:
+        # End whatever transaction the sheet left open so the next task starts clean
+        if _DB is not None:
+            _DB.rollback()
+
+def extract_sheet_columns_worker(pdf_path: str, page_number: int, sheet_title: str, sheet_type: str,
+                                 sheet_id: int) -> Tuple[int, List[Dict]]:
+    """Worker function to extract (not save) columns for a single sheet - designed for multiprocessing"""
+    from columns import extract_column_centers
+    
+    print(f"🔄 Worker extracting columns for sheet {sheet_id} (PID: {os.getpid()})")
+    
+    # No database access here; the parent process writes the results
+    return sheet_id, extract_column_centers(pdf_path, page_number, sheet_title, sheet_type)
@@ -0,0 +1,27 @@
+"""
+Per-process cache of open PDF documents shared by the sheet, column and
+elevation pipelines.
+"""
+import os
+import threading
+from functools import lru_cache
+
+import fitz
+
+# fitz.Document is not thread-safe; page access on a cached document goes through this lock
+PDF_LOCK = threading.Lock()
+
+
+@lru_cache(maxsize=8)
+def _open_pdf(pdf_path: str, mtime: float) -> fitz.Document:
+    """
+    Open a PDF once per (path, mtime) so every reader of the same document reuses
+    one parse; evicted documents are closed by fitz.Document's finalizer.
+    """
+    return fitz.open(pdf_path)
+
+
+def open_pdf(pdf_path: str) -> fitz.Document:
+    """Cached document for pdf_path, reopened when the file changes; do not close it"""
+    pdf_path = str(pdf_path)
+    return _open_pdf(pdf_path, os.path.getmtime(pdf_path))
@@ -6,6 +6,7 @@ import os
 import sys
 from dotenv import load_dotenv
 import psycopg2
+import sqlparse
 
 def run_sql_file(sql_file_path):
     """Execute SQL file against the database"""
@@ -21,15 +22,31 @@ def run_sql_file(sql_file_path):
         with open(sql_file_path, 'r') as f:
             sql_content = f.read()
         
-        # Split the script by semicolons and execute each statement
-        statements = [stmt.strip() for stmt in sql_content.split(';') if stmt.strip() and not stmt.strip().startswith('--')]
+        # Split with a real SQL parser so semicolons inside strings, comments and
+        # $$ bodies stay put; drop comment-only fragments and classify each
+        # statement (SELECT, INSERT, ...) once up front
+        statements = [(stmt, sqlparse.parse(stmt)[0].get_type())
+                      for stmt in sqlparse.split(sql_content)
+                      if sqlparse.format(stmt, strip_comments=True).strip()]
         
-        for statement in statements:
-            print(f'Executing: {statement[:50]}...')
-            cursor.execute(statement)
+        # Consecutive non-SELECT statements go to the server as one multi-statement
+        # batch; SELECTs run on their own so their results can be shown
+        batch = []
+        for statement, kind in statements + [(None, None)]:
+            is_select = kind == 'SELECT'
+            if statement is not None and not is_select:
+                batch.append(statement)
+                continue
             
-            # If it's a SELECT statement, show results
-            if statement.strip().upper().startswith('SELECT'):
+            if batch:
+                print(f'Executing {len(batch)} statement(s): {batch[0][:50]}...')
+                cursor.execute('\n'.join(batch))
+                print(f'  Affected rows (last statement): {cursor.rowcount}')
+                batch = []
+            
+            if is_select:
+                print(f'Executing: {statement[:50]}...')
+                cursor.execute(statement)
                 results = cursor.fetchall()
                 if results:
                     print('Results:')
@@ -37,8 +54,6 @@ def run_sql_file(sql_file_path):
                         print(f'  {row}')
                 else:
                     print('  No results')
-            else:
-                print(f'  Affected rows: {cursor.rowcount}')
         
         conn.commit()
         cursor.close()
@@ -4,7 +4,7 @@ Database setup script for ConcretePro PostgreSQL migration
 """
 import psycopg2
 from psycopg2.extensions import ISOLATION_LEVEL_AUTOCOMMIT
-from database import Base, engine
+from database import Base, engine, SheetWall, SheetGridLine
 from dotenv import load_dotenv
 import os
 
@@ -75,6 +75,19 @@ def create_tables():
         print(f"❌ Error creating tables: {e}")
         return False
 
+def create_indexes():
+    """Create indexes added after the initial schema on existing tables"""
+    try:
+        print("📇 Creating missing indexes...")
+        for model in (SheetWall, SheetGridLine):
+            for index in model.__table__.indexes:
+                index.create(bind=engine, checkfirst=True)
+        print("✅ Indexes are up to date")
+        return True
+    except Exception as e:
+        print(f"❌ Error creating indexes: {e}")
+        return False
+
 def main():
     """Main setup function"""
     print("🚀 Setting up ConcretePro PostgreSQL database...")
@@ -89,6 +102,11 @@ def main():
         print("❌ Failed to create tables.")
         return
     
+    # Step 3: Create indexes on tables that predate them
+    if not create_indexes():
+        print("❌ Failed to create indexes.")
+        return
+    
     print("🎉 Database setup completed successfully!")
     print("\n📝 Next steps:")
     print("1. Install dependencies: pip install -r requirements.txt")
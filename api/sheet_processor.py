@@ -7,10 +7,11 @@ Handles processing of individual sheets after drawing index extraction
 import json
 import sys
 import os
+import uuid
 
 def generate_svg_content(pdf_path: str, page_number: int) -> str:
     """
-    Generate SVG file for a specific page in the PDF using pdftocairo and return the file path.
+    Generate SVG file for a specific page in the PDF using PyMuPDF and return the file path.
     
     Args:
         pdf_path: Path to the PDF file
@@ -20,8 +21,8 @@ def generate_svg_content(pdf_path: str, page_number: int) -> str:
         str: Path to the saved SVG file
     """
     
-    import subprocess
     from pathlib import Path
+    from pdf_cache import open_pdf, PDF_LOCK
     
     try:
         # Create SVG folder next to the PDF file
@@ -33,26 +34,26 @@ def generate_svg_content(pdf_path: str, page_number: int) -> str:
         svg_filename = f"page_{page_number}.svg"
         svg_path = svg_folder / svg_filename
 
-        # Use pdftocairo to convert specific page to SVG
-        cmd = ['pdftocairo', '-svg', str(pdf_path), str(svg_path), '-f', str(page_number), '-l', str(page_number)]
+        # Render the page in-process from the cached document instead of spawning
+        # pdftocairo, which re-parsed the whole PDF for every page
+        doc = open_pdf(pdf_path)
         
-        result = subprocess.run(cmd, capture_output=True, text=True, check=True)
+        # Write a temp file in the same folder and rename it over the final path;
+        # os.replace is atomic within one filesystem, so readers never see a partial SVG
+        tmp_svg = svg_folder / f".{svg_filename}.{uuid.uuid4().hex}.tmp"
+        try:
+            with PDF_LOCK:
+                svg = doc.load_page(page_number - 1).get_svg_image()
+            tmp_svg.write_text(svg, encoding="utf-8")
+            os.replace(tmp_svg, svg_path)
+        finally:
+            tmp_svg.unlink(missing_ok=True)
         
         print(f"✅ Generated SVG file: {svg_path}")
         print(f"📁 Saved to: {svg_folder}")
         
         return str(svg_path)
         
-    except subprocess.CalledProcessError as e:
-        print(f"❌ Error running pdftocairo: {e}")
-        print(f"Command output: {e.stdout}")
-        print(f"Command error: {e.stderr}")
-        
-    except FileNotFoundError:
-        print("❌ pdftocairo command not found. Please install poppler-utils:")
-        print("   macOS: brew install poppler")
-        print("   Ubuntu: sudo apt-get install poppler-utils")
-        
     except Exception as e:
         print(f"❌ Error generating SVG: {e}")
     
@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+"""
+Regression tests for align_detections (run from api/: python -m unittest test_align_detections)
+"""
+import unittest
+
+import numpy as np
+
+from align_detections import iterative_align_and_assign
+
+
+class SinglePointAlignmentTest(unittest.TestCase):
+    """Trimmed ICP keeps at least 2 points, which must not overrun 1-point inputs"""
+
+    def _align(self, el_centers, door_centers):
+        return iterative_align_and_assign(np.array(el_centers, dtype=np.float64),
+                                          np.array(door_centers, dtype=np.float64),
+                                          verbose=False)
+
+    def test_single_el_and_door(self):
+        params, matches, _ = self._align([[1.0, 2.0]], [[3.0, 4.0]])
+        self.assertIsNotNone(params)
+        el_idx, door_idx, _ = matches
+        self.assertEqual(list(el_idx), [0])
+        self.assertEqual(list(door_idx), [0])
+
+    def test_single_el(self):
+        params, matches, _ = self._align([[1.0, 2.0]], [[3.0, 4.0], [50.0, 60.0]])
+        self.assertIsNotNone(params)
+        self.assertEqual(len(matches[0]), 1)
+
+    def test_single_door(self):
+        params, matches, _ = self._align([[1.0, 2.0], [40.0, 40.0]], [[3.0, 4.0]])
+        self.assertIsNotNone(params)
+        self.assertEqual(len(matches[0]), 2)
+        # Many-to-one assignment still gives every EL a DOOR or -1
+        self.assertTrue(set(matches[1].tolist()) <= {0, -1})
+
+
+if __name__ == "__main__":
+    unittest.main()
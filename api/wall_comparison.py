@@ -2,8 +2,11 @@
 Wall Comparison Tool for ConcretePro
 Compares walls between two sheets by aligning grid systems and finding mismatches
 """
+import threading
 import numpy as np
 from typing import List, Dict, Tuple, Optional
+from scipy.spatial import cKDTree
+from sqlalchemy import func
 from sqlalchemy.orm import Session
 from database import SheetWall, SheetGridLine, Sheet, SessionLocal
 import math
@@ -97,6 +100,59 @@ def get_sheet_grid_lines(sheet_id: int, db: Session = None) -> List[Dict]:
             db.close()
 
 
+# Grid line bundles per sheet: sheet_id -> (version, grid lines, KD-tree)
+_GRID_BUNDLE_CACHE = {}
+_GRID_BUNDLE_CACHE_SIZE = 128
+_GRID_BUNDLE_LOCK = threading.Lock()
+
+
+def _grid_lines_version(sheet_id: int, db: Session) -> Tuple:
+    """
+    Cheap fingerprint of a sheet's grid lines: row count, max id and max updated_at.
+    Re-saving grid lines deletes and re-inserts rows, so the fingerprint changes in
+    every process, not just the one that did the save.
+    """
+    return tuple(db.query(
+        func.count(SheetGridLine.id), func.max(SheetGridLine.id), func.max(SheetGridLine.updated_at)
+    ).filter(SheetGridLine.sheet_id == sheet_id).one())
+
+
+def _grid_bundle(sheet_id: int, db: Session) -> Tuple[List[Dict], Optional[cKDTree]]:
+    """
+    Load a sheet's grid lines once and build a KD-tree over their centers
+    
+    Cached per sheet and revalidated against _grid_lines_version on every call, so
+    repeated comparisons against the same reference sheet skip the full load and
+    tree build until the grid lines change. Callers must treat the returned list
+    as read-only.
+    
+    Args:
+        sheet_id: ID of the sheet
+        db: Database session the caller already holds
+        
+    Returns:
+        Tuple of (grid line dictionaries, KD-tree over their centers or None if empty)
+    """
+    version = _grid_lines_version(sheet_id, db)
+    with _GRID_BUNDLE_LOCK:
+        cached = _GRID_BUNDLE_CACHE.get(sheet_id)
+    if cached is not None and cached[0] == version:
+        return cached[1], cached[2]
+    
+    grid_lines = get_sheet_grid_lines(sheet_id, db)
+    tree = None
+    if grid_lines:
+        points = np.array([[gl['center_x'], gl['center_y']] for gl in grid_lines], dtype=np.float64)
+        tree = cKDTree(points)
+    
+    with _GRID_BUNDLE_LOCK:
+        # Evict the oldest sheet once the cache is full
+        if sheet_id not in _GRID_BUNDLE_CACHE and len(_GRID_BUNDLE_CACHE) >= _GRID_BUNDLE_CACHE_SIZE:
+            del _GRID_BUNDLE_CACHE[next(iter(_GRID_BUNDLE_CACHE))]
+        _GRID_BUNDLE_CACHE[sheet_id] = (version, grid_lines, tree)
+    return grid_lines, tree
+
+
 def get_sheet_info(sheet_id: int, db: Session = None) -> Optional[Dict]:
     """
     Get sheet information from database
@@ -178,67 +234,81 @@ def calculate_grid_alignment(grid_lines_1: List[Dict], grid_lines_2: List[Dict])
     return dx, dy
 
 
-def transform_walls(walls: List[Dict], dx: float, dy: float) -> List[Dict]:
+def wall_centers(walls: List[Dict]) -> np.ndarray:
     """
-    Transform wall positions by translation offset
+    Collect wall centers into one array; the only wall fields alignment needs
     
     Args:
         walls: List of wall dictionaries
+        
+    Returns:
+        (N, 2) float64 array of (center_x, center_y)
+    """
+    return np.array([(w['center_x'], w['center_y']) for w in walls], dtype=np.float64).reshape(-1, 2)
+
+
+def transform_walls(centers: np.ndarray, dx: float, dy: float) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Transform wall positions by translation offset
+    
+    Args:
+        centers: (N, 2) wall centers from wall_centers (left untouched)
         dx: Translation offset in X direction
         dy: Translation offset in Y direction
         
     Returns:
-        List of transformed wall dictionaries (with original coordinates preserved)
+        Tuple of (center_x, center_y) arrays of the translated wall centers
     """
-    transformed = []
-    for wall in walls:
-        transformed_wall = wall.copy()
-        
-        # Store original coordinates
-        transformed_wall['original_center_x'] = wall['center_x']
-        transformed_wall['original_center_y'] = wall['center_y']
-        
-        # Apply transformation
-        transformed_wall['center_x'] = wall['center_x'] + dx
-        transformed_wall['center_y'] = wall['center_y'] + dy
-        
-        transformed.append(transformed_wall)
-    
-    return transformed
+    aligned = centers + (dx, dy)
+    return aligned[:, 0], aligned[:, 1]
 
 
-def find_wall_matches(walls_1: List[Dict], walls_2: List[Dict], tolerance: float = 2.0) -> Tuple[List[Dict], List[Dict], List[Dict]]:
+def find_wall_matches(walls_1: List[Dict], walls_2: List[Dict], tolerance: float = 2.0,
+                      aligned_2: Optional[Tuple[np.ndarray, np.ndarray]] = None) -> Tuple[List[Dict], List[Dict], List[Dict]]:
     """
     Find matching and unmatched walls between two sheets
     
     Args:
         walls_1: Walls from first sheet
-        walls_2: Walls from second sheet (already aligned)
+        walls_2: Walls from second sheet
         tolerance: Maximum distance to consider walls as matching
+        aligned_2: Optional (center_x, center_y) arrays of sheet 2 walls aligned to
+            sheet 1 (from transform_walls); the wall dicts' own centers are used otherwise
         
     Returns:
         Tuple of (matches, unmatched_in_sheet1, unmatched_in_sheet2)
     """
+    if aligned_2 is None:
+        aligned_2 = (
+            [w['center_x'] for w in walls_2],
+            [w['center_y'] for w in walls_2]
+        )
+    cx2, cy2 = aligned_2
+    tolerance_sq = tolerance * tolerance
+    
     matches = []
-    unmatched_1 = walls_1.copy()
-    unmatched_2 = walls_2.copy()
+    matched_1 = np.zeros(len(walls_1), dtype=bool)
+    matched_2 = np.zeros(len(walls_2), dtype=bool)
     
     # Find matches based on position, size, and orientation
     for i, wall1 in enumerate(walls_1):
         best_match = None
-        best_distance = float('inf')
+        best_d2 = float('inf')
         best_match_idx = -1
         
         for j, wall2 in enumerate(walls_2):
+            # Each sheet 2 wall can only be matched once
+            if matched_2[j]:
+                continue
+            
             # Check if orientations match
             if wall1['orientation'] != wall2['orientation']:
                 continue
             
-            # Calculate center distance
-            distance = math.sqrt(
-                (wall1['center_x'] - wall2['center_x'])**2 + 
-                (wall1['center_y'] - wall2['center_y'])**2
-            )
+            # Squared center distance (sqrt only taken for the accepted match)
+            ddx = wall1['center_x'] - cx2[j]
+            ddy = wall1['center_y'] - cy2[j]
+            d2 = ddx * ddx + ddy * ddy
             
             # Check size similarity (width, height, thickness)
             width_diff = abs(wall1['width'] - wall2['width'])
@@ -251,13 +321,13 @@ def find_wall_matches(walls_1: List[Dict], walls_2: List[Dict], tolerance: float
             max_thickness_diff = max(wall1['thickness'], wall2['thickness']) * 0.1
             
             # Wall matches if position is close AND dimensions are similar
-            if (distance <= tolerance and 
+            if (d2 <= tolerance_sq and 
                 width_diff <= max_width_diff and 
                 height_diff <= max_height_diff and 
                 thickness_diff <= max_thickness_diff):
                 
-                if distance < best_distance:
-                    best_distance = distance
+                if d2 < best_d2:
+                    best_d2 = d2
                     best_match = wall2
                     best_match_idx = j
         
@@ -266,14 +336,14 @@ def find_wall_matches(walls_1: List[Dict], walls_2: List[Dict], tolerance: float
             matches.append({
                 'wall1': wall1,
                 'wall2': best_match,
-                'distance': best_distance
+                'distance': math.sqrt(best_d2)
             })
             
-            # Remove from unmatched lists
-            if wall1 in unmatched_1:
-                unmatched_1.remove(wall1)
-            if best_match in unmatched_2:
-                unmatched_2.remove(best_match)
+            matched_1[i] = True
+            matched_2[best_match_idx] = True
+    
+    unmatched_1 = [walls_1[i] for i in np.flatnonzero(~matched_1)]
+    unmatched_2 = [walls_2[j] for j in np.flatnonzero(~matched_2)]
     
     print(f"🔍 Wall matching results:")
     print(f"  Matches found: {len(matches)}")
@@ -283,7 +353,8 @@ def find_wall_matches(walls_1: List[Dict], walls_2: List[Dict], tolerance: float
     return matches, unmatched_1, unmatched_2
 
 
-def find_nearby_grid_lines(x: float, y: float, grid_lines: List[Dict], max_distance: float = 50.0) -> List[Dict]:
+def find_nearby_grid_lines(x: float, y: float, grid_lines: List[Dict], max_distance: float = 50.0,
+                           tree: Optional[cKDTree] = None) -> List[Dict]:
     """
     Find grid lines near a given point
     
@@ -292,27 +363,39 @@ def find_nearby_grid_lines(x: float, y: float, grid_lines: List[Dict], max_dista
         y: Y coordinate of the point
         grid_lines: List of grid line dictionaries
         max_distance: Maximum distance to search for grid lines
+        tree: Optional KD-tree over the grid line centers (from _grid_bundle)
         
     Returns:
         List of nearby grid lines with distances
     """
+    if tree is not None:
+        # distance_upper_bound is exclusive; nudge it so lines exactly max_distance away
+        # are kept, as in the linear scan below
+        distances, indices = tree.query([x, y], k=min(4, len(grid_lines)),
+                                        distance_upper_bound=np.nextafter(max_distance, np.inf))
+        return [
+            {'grid_line': grid_lines[i], 'distance': float(d)}
+            for d, i in zip(np.atleast_1d(distances), np.atleast_1d(indices))
+            if i < len(grid_lines)
+        ]
+    
+    max_distance_sq = max_distance * max_distance
     nearby = []
     
     for grid_line in grid_lines:
-        distance = math.sqrt(
-            (x - grid_line['center_x'])**2 + 
-            (y - grid_line['center_y'])**2
-        )
-        
-        if distance <= max_distance:
-            nearby.append({
-                'grid_line': grid_line,
-                'distance': distance
-            })
-    
-    # Sort by distance and return closest ones
-    nearby.sort(key=lambda x: x['distance'])
-    return nearby[:4]  # Return up to 4 closest grid lines
+        ddx = x - grid_line['center_x']
+        ddy = y - grid_line['center_y']
+        d2 = ddx * ddx + ddy * ddy
+        
+        if d2 <= max_distance_sq:
+            nearby.append((d2, grid_line))
+    
+    # Sort by squared distance and return closest ones (up to 4), sqrt'ing only those
+    nearby.sort(key=lambda item: item[0])
+    return [
+        {'grid_line': grid_line, 'distance': math.sqrt(d2)}
+        for d2, grid_line in nearby[:4]
+    ]
 
 
 def format_grid_reference(nearby_grid_lines: List[Dict]) -> str:
@@ -378,8 +461,8 @@ def compare_sheet_walls(sheet_id_1: int, sheet_id_2: int, tolerance: float = 2.0
         # Get walls and grid lines for both sheets
         walls_1 = get_sheet_walls(sheet_id_1, db)
         walls_2 = get_sheet_walls(sheet_id_2, db)
-        grid_lines_1 = get_sheet_grid_lines(sheet_id_1, db)
-        grid_lines_2 = get_sheet_grid_lines(sheet_id_2, db)
+        grid_lines_1, grid_tree_1 = _grid_bundle(sheet_id_1, db)
+        grid_lines_2, grid_tree_2 = _grid_bundle(sheet_id_2, db)
         
         print(f"\n📋 Comparing walls between sheets:")
         print(f"  Sheet 1: {sheet1_info['code']} - {sheet1_info['title']}")
@@ -396,19 +479,18 @@ def compare_sheet_walls(sheet_id_1: int, sheet_id_2: int, tolerance: float = 2.0
         # Calculate grid alignment
         dx, dy = calculate_grid_alignment(grid_lines_1, grid_lines_2)
         
-        # Transform sheet 2 walls to align with sheet 1
-        aligned_walls_2 = transform_walls(walls_2, dx, dy)
+        # Transform sheet 2 wall centers to align with sheet 1 (walls_2 keeps original coordinates)
+        aligned_2 = transform_walls(wall_centers(walls_2), dx, dy)
         
         # Find matches and mismatches
-        matches, unmatched_1, unmatched_2 = find_wall_matches(walls_1, aligned_walls_2, tolerance)
+        matches, unmatched_1, unmatched_2 = find_wall_matches(walls_1, walls_2, tolerance, aligned_2)
         
         # Add grid references for unmatched walls
         for wall in unmatched_1:
-            wall['grid_ref'] = format_grid_reference(find_nearby_grid_lines(wall['center_x'], wall['center_y'], grid_lines_1))
+            wall['grid_ref'] = format_grid_reference(find_nearby_grid_lines(wall['center_x'], wall['center_y'], grid_lines_1, tree=grid_tree_1))
         
         for wall in unmatched_2:
-            # Use original coordinates for grid reference lookup
-            wall['grid_ref'] = format_grid_reference(find_nearby_grid_lines(wall['original_center_x'], wall['original_center_y'], grid_lines_2))
+            wall['grid_ref'] = format_grid_reference(find_nearby_grid_lines(wall['center_x'], wall['center_y'], grid_lines_2, tree=grid_tree_2))
         
         # Prepare results - focus only on unmatched walls with grid references
         result = {
@@ -436,8 +518,8 @@ def compare_sheet_walls(sheet_id_1: int, sheet_id_2: int, tolerance: float = 2.0
                     {
                         'sheet_id': wall['sheet_id'],
                         'wall_index': wall['index'],
-                        'center_x': wall['original_center_x'],  # Use original coordinates
-                        'center_y': wall['original_center_y'],
+                        'center_x': wall['center_x'],
+                        'center_y': wall['center_y'],
                         'width': wall['width'],
                         'height': wall['height'],
                         'orientation': wall['orientation'],
@@ -5,10 +5,24 @@ Extracts wall positions and orientations from PDF construction drawings
 """
 
 import fitz
+import numpy as np
 import os
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
 from typing import List, Dict, Any, Optional
 from sqlalchemy.orm import Session
-from database import Sheet, Document, SheetWall, SessionLocal
+from database import Sheet, Document, SheetWall, SessionLocal, engine
+from multiprocessing_workers import extract_sheet_walls_worker, init_db_worker
+
+# Wall filter thresholds (fill color 0.753 is the same as columns)
+WALL_FILL_COLOR = 0.753
+FILL_TOLERANCE = 0.001
+MIN_WALL_THICKNESS = 12
+MAX_WALL_THICKNESS = 30
+EXCLUDED_LENGTH = 90.0  # Column/symbol size, not a wall
+EXCLUDED_LENGTH_TOLERANCE = 0.01
+MIN_ASPECT_RATIO = 5.0
+_NO_FILL = (0, 0, 0)
 
 
 def extract_concrete_walls(pdf_path: str, page_number: int) -> List[Dict[str, Any]]:
@@ -25,83 +39,86 @@ def extract_concrete_walls(pdf_path: str, page_number: int) -> List[Dict[str, An
     
     print(f"  Processing walls on page {page_number}: Found {len(drawings)} total drawings")
     
-    walls = []
-    wall_count = 0
+    # Single pass keeping filled drawings in the wall color (the most selective test),
+    # so rect coordinates are only read for candidates; geometry tests run as NumPy masks
+    rects = [
+        d['rect'] for d in drawings
+        if d.get('type') == 'f'
+        and abs((d.get('fill') or _NO_FILL)[0] - WALL_FILL_COLOR) <= FILL_TOLERANCE
+        and d.get('rect')
+    ]
+    if not rects:
+        doc.close()
+        print(f"  Found 0 concrete walls on page {page_number}")
+        return []
+    
+    rects = np.array([(r.x0, r.y0, r.x1, r.y1) for r in rects], dtype=np.float64)
     
-    # Process each drawing to find walls
-    for i, drawing in enumerate(drawings):
-        drawing_type = drawing.get('type', 'Unknown')
+    widths = np.abs(rects[:, 2] - rects[:, 0])
+    heights = np.abs(rects[:, 3] - rects[:, 1])
+    shorter = np.minimum(widths, heights)
+    longer = np.maximum(widths, heights)
+    
+    # Wall characteristics:
+    # 1. Shorter side is between 12-30 units
+    # 2. Longer side is not the 90-unit column/symbol size
+    # 3. Wall should be at least 5x longer than it is wide
+    mask = (
+        (shorter >= MIN_WALL_THICKNESS) & (shorter <= MAX_WALL_THICKNESS)
+        & (np.abs(longer - EXCLUDED_LENGTH) >= EXCLUDED_LENGTH_TOLERANCE)
+    )
+    aspect_ratios = np.zeros_like(shorter)
+    np.divide(longer, shorter, out=aspect_ratios, where=shorter > 0)
+    mask &= aspect_ratios >= MIN_ASPECT_RATIO
+    
+    walls = []
+    for wall_count, i in enumerate(np.flatnonzero(mask)):
+        x0, y0, x1, y1 = (float(v) for v in rects[i])
+        width = float(widths[i])
+        height = float(heights[i])
+        shorter_side = float(shorter[i])
+        longer_side = float(longer[i])
         
-        # Check if drawing type is 'f' (filled) - walls are filled shapes
-        if drawing_type == 'f':
-            rect = drawing.get('rect')
-            fill_color = drawing.get('fill', [0, 0, 0])
-            
-            # Filter by fill color (0.753 same as columns)
-            if abs(fill_color[0] - 0.753) > 0.001:
-                continue
-            
-            if rect:
-                width = abs(rect.x1 - rect.x0)
-                height = abs(rect.y1 - rect.y0)
-                
-                # Wall characteristics:
-                # 1. One side is much longer than the other (aspect ratio check)
-                # 2. Shorter side is between 12-30 units
-                shorter_side = min(width, height)
-                longer_side = max(width, height)
-                
-                # Check if shorter side is in the valid range
-                if shorter_side < 12 or shorter_side > 30:
-                    continue
-
-                if abs(longer_side - 90) < 0.01:
-                    continue
-                
-                # Check aspect ratio - longer side should be significantly longer
-                aspect_ratio = longer_side / shorter_side if shorter_side > 0 else 0
-                if aspect_ratio < 5.0:  # Wall should be at least 5x longer than it is wide
-                    continue
-                
-                # Calculate center point
-                center_x = (rect.x0 + rect.x1) / 2
-                center_y = (rect.y0 + rect.y1) / 2
-                
-                # Determine orientation
-                orientation = "horizontal" if width > height else "vertical"
-                
-                wall_data = {
-                    "index": wall_count,
-                    "center": (center_x, center_y),
-                    "center_x": center_x,
-                    "center_y": center_y,
-                    "width": width,
-                    "height": height,
-                    "shorter_side": shorter_side,
-                    "longer_side": longer_side,
-                    "aspect_ratio": round(aspect_ratio, 2),
-                    "orientation": orientation,
-                    "thickness": shorter_side,
-                    "length": longer_side,
-                    "rect": {
-                        "x0": rect.x0,
-                        "y0": rect.y0, 
-                        "x1": rect.x1,
-                        "y1": rect.y1
-                    }
-                }
-                
-                walls.append(wall_data)
-                wall_count += 1
+        # Calculate center point
+        center_x = (x0 + x1) / 2
+        center_y = (y0 + y1) / 2
+        
+        # Determine orientation
+        orientation = "horizontal" if width > height else "vertical"
+        
+        walls.append({
+            "index": wall_count,
+            "center": (center_x, center_y),
+            "center_x": center_x,
+            "center_y": center_y,
+            "width": width,
+            "height": height,
+            "shorter_side": shorter_side,
+            "longer_side": longer_side,
+            "aspect_ratio": round(float(aspect_ratios[i]), 2),
+            "orientation": orientation,
+            "thickness": shorter_side,
+            "length": longer_side,
+            "rect": {
+                "x0": x0,
+                "y0": y0, 
+                "x1": x1,
+                "y1": y1
+            }
+        })
     
     doc.close()
     print(f"  Found {len(walls)} concrete walls on page {page_number}")
     return walls
 
 
-def save_walls_to_database(sheet_id: int, walls: List[Dict[str, Any]]) -> int:
+def save_walls_to_database(sheet_id: int, walls: List[Dict[str, Any]], db: Session = None) -> int:
     """Save extracted walls to database"""
-    db = SessionLocal()
+    close_db = False
+    if db is None:
+        db = SessionLocal()
+        close_db = True
+    
     try:
         # Delete existing walls for this sheet
         db.query(SheetWall).filter(SheetWall.sheet_id == sheet_id).delete()
@@ -133,12 +150,17 @@ def save_walls_to_database(sheet_id: int, walls: List[Dict[str, Any]]) -> int:
         db.rollback()
         return 0
     finally:
-        db.close()
+        if close_db:
+            db.close()
 
 
-def extract_and_save_sheet_walls(sheet_id: int) -> Dict[str, Any]:
+def extract_and_save_sheet_walls(sheet_id: int, db: Session = None) -> Dict[str, Any]:
     """Extract walls from a sheet and save to database"""
-    db = SessionLocal()
+    close_db = False
+    if db is None:
+        db = SessionLocal()
+        close_db = True
+    
     try:
         # Get sheet information
         sheet = db.query(Sheet).filter(Sheet.id == sheet_id).first()
@@ -160,7 +182,7 @@ def extract_and_save_sheet_walls(sheet_id: int) -> Dict[str, Any]:
         walls = extract_concrete_walls(pdf_path, sheet.page)
         
         # Save to database
-        saved_count = save_walls_to_database(sheet_id, walls)
+        saved_count = save_walls_to_database(sheet_id, walls, db)
         
         return {
             "success": True,
@@ -179,30 +201,95 @@ def extract_and_save_sheet_walls(sheet_id: int) -> Dict[str, Any]:
         print(f"❌ Error extracting walls: {e}")
         return {"success": False, "error": str(e)}
     finally:
-        db.close()
+        if close_db:
+            db.close()
+
+
+def extract_and_save_sheets(sheet_ids: List[int]) -> Dict[int, Dict[str, Any]]:
+    """Extract and save walls for several sheets in parallel, keyed by sheet id"""
+    if not sheet_ids:
+        return {}
+    
+    if len(sheet_ids) == 1:
+        return {sheet_ids[0]: extract_and_save_sheet_walls(sheet_ids[0])}
+    
+    # Cap workers so each process's connection pool doesn't exhaust the database
+    max_workers = min(len(sheet_ids), multiprocessing.cpu_count(), 8)
+    print(f"🧱 Extracting walls for {len(sheet_ids)} sheets with {max_workers} workers")
+    
+    results = {}
+    try:
+        with ProcessPoolExecutor(max_workers=max_workers, initializer=init_db_worker) as executor:
+            future_to_sheet = {
+                executor.submit(extract_sheet_walls_worker, sheet_id): sheet_id
+                for sheet_id in sheet_ids
+            }
+            
+            for future in future_to_sheet:
+                sheet_id = future_to_sheet[future]
+                try:
+                    results[sheet_id] = future.result(timeout=300)  # 5 minute timeout per sheet
+                except Exception as e:
+                    print(f"❌ Exception extracting walls for sheet {sheet_id}: {e}")
+                    results[sheet_id] = {"success": False, "error": str(e)}
+    
+    except Exception as e:
+        print(f"❌ Multiprocessing wall extraction failed: {e}")
+        print("🔄 Falling back to sequential extraction...")
+        for sheet_id in sheet_ids:
+            if sheet_id not in results:
+                results[sheet_id] = extract_and_save_sheet_walls(sheet_id)
+    
+    return results
+
+
+# Column order for raw sheet_walls reads (matches the ix_sheet_walls_sheet_index covering index)
+_WALL_COLUMNS = (
+    "id", "index", "center_x", "center_y", "width", "height",
+    "orientation", "thickness", "length", "aspect_ratio", "created_at"
+)
+_SELECT_SHEET_WALLS_SQL = (
+    'SELECT id, "index", center_x, center_y, width, height, orientation, '
+    'thickness, length, aspect_ratio, created_at '
+    'FROM sheet_walls WHERE sheet_id = %s ORDER BY "index"'
+)
+
+
+def get_sheet_walls_raw(sheet_id: int, db: Session = None) -> List[Dict[str, Any]]:
+    """Read a sheet's walls through the DBAPI cursor, skipping ORM object construction"""
+    if db is not None:
+        # Reuse the session's connection so reads see its uncommitted writes
+        conn = db.connection().connection
+        release = False
+    else:
+        conn = engine.raw_connection()
+        release = True
+    
+    try:
+        cursor = conn.cursor()
+        try:
+            cursor.execute(_SELECT_SHEET_WALLS_SQL, (sheet_id,))
+            rows = cursor.fetchall()
+        finally:
+            cursor.close()
+    finally:
+        if release:
+            conn.close()  # Returns the connection to the pool
+    
+    walls_data = []
+    for row in rows:
+        wall = dict(zip(_WALL_COLUMNS, row))
+        created_at = wall["created_at"]
+        wall["created_at"] = created_at.isoformat() if created_at else None
+        walls_data.append(wall)
+    
+    return walls_data
 
 
-def get_sheet_walls(sheet_id: int) -> Dict[str, Any]:
+def get_sheet_walls(sheet_id: int, db: Session = None) -> Dict[str, Any]:
     """Get saved walls for a sheet from database"""
-    db = SessionLocal()
     try:
-        walls = db.query(SheetWall).filter(SheetWall.sheet_id == sheet_id).order_by(SheetWall.index).all()
-        
-        walls_data = []
-        for wall in walls:
-            walls_data.append({
-                "id": wall.id,
-                "index": wall.index,
-                "center_x": wall.center_x,
-                "center_y": wall.center_y,
-                "width": wall.width,
-                "height": wall.height,
-                "orientation": wall.orientation,
-                "thickness": wall.thickness,
-                "length": wall.length,
-                "aspect_ratio": wall.aspect_ratio,
-                "created_at": wall.created_at.isoformat() if wall.created_at else None
-            })
+        walls_data = get_sheet_walls_raw(sheet_id, db)
         
         return {
             "success": True,
@@ -213,5 +300,3 @@ def get_sheet_walls(sheet_id: int) -> Dict[str, Any]:
     except Exception as e:
         print(f"❌ Error getting walls: {e}")
         return {"success": False, "error": str(e)}
-    finally:
-        db.close()
\ No newline at end of file